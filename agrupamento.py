@@ -0,0 +1,59 @@
+'''
+Agrupamento (KMeans) dos meses por selic, inadimplencia e posicao no tempo
+Autor: Luis Henrique Ponciano
+'''
+
+import numpy as np
+from sklearn.cluster import KMeans, MiniBatchKMeans
+from sklearn.metrics import silhouette_score
+from sklearn.preprocessing import StandardScaler
+
+
+def novo_modelo(k: int, n_amostras: int, limite_minibatch: int):
+    """
+    Historicos grandes usam MiniBatchKMeans, que ajusta em pequenos lotes
+    """
+    if n_amostras > limite_minibatch:
+        return MiniBatchKMeans(n_clusters=k, n_init=3, batch_size=1024, random_state=42)
+    return KMeans(n_clusters=k, n_init=10, random_state=42)
+
+
+def agrupar(selic, inadimplencia, k_maximo: int, limite_minibatch: int, k=None) -> dict:
+    """
+    Padroniza (selic, inadimplencia, indice do mes) e ajusta o KMeans.
+    Sem 'k' informado testa de 2 ate k_maximo grupos e fica com a maior silhueta
+    """
+    X = np.column_stack([
+        np.asarray(selic, dtype=float),
+        np.asarray(inadimplencia, dtype=float),
+        np.arange(len(selic), dtype=float)
+    ])
+    scaler = StandardScaler()
+    X_padrao = scaler.fit_transform(X)
+    n = len(X_padrao)
+
+    if k is None:
+        candidatos = range(2, min(k_maximo, n - 1) + 1)
+        melhor = None
+        for k_teste in candidatos:
+            modelo = novo_modelo(k_teste, n, limite_minibatch).fit(X_padrao)
+            # a silhueta e quadratica no numero de pontos: amostra nos historicos grandes
+            nota = silhouette_score(
+                X_padrao,
+                modelo.labels_,
+                sample_size = min(n, limite_minibatch),
+                random_state = 42
+            )
+            if melhor is None or nota > melhor[0]:
+                melhor = (nota, modelo)
+        modelo = melhor[1] if melhor else novo_modelo(1, n, limite_minibatch).fit(X_padrao)
+    else:
+        modelo = novo_modelo(min(k, n), n, limite_minibatch).fit(X_padrao)
+
+    return dict(
+        k = modelo.n_clusters,
+        rotulos = modelo.labels_,
+        centros = scaler.inverse_transform(modelo.cluster_centers_),
+        modelo = modelo,
+        scaler = scaler
+    )
@@ -0,0 +1,178 @@
+'''
+Pool de conexoes sqlite usado pelas rotas do main2.py
+Autor: Luis Henrique Ponciano
+'''
+
+import os
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+import config
+from metricas import ConexaoMedida
+
+
+def nova_conexao(caminho: str) -> sqlite3.Connection:
+    """
+    Abre uma conexao ja ajustada com as opcoes do config.py:
+    - WAL deixa leitores trabalhando enquanto alguem grava
+    - cache_size / mmap_size evitam reler paginas do disco a cada consulta
+    - cached_statements reaproveita os comandos SQL ja preparados
+    - com METRICAS_SQL cada comando e cronometrado (metricas.py)
+    """
+    conn = sqlite3.connect(
+        caminho,
+        timeout = config.DB_TIMEOUT,
+        cached_statements = config.DB_CACHED_STATEMENTS,
+        check_same_thread = False,
+        factory = ConexaoMedida if config.METRICAS_SQL else sqlite3.Connection
+    )
+    if config.DB_WAL:
+        conn.execute('PRAGMA journal_mode = WAL')
+        conn.execute('PRAGMA synchronous = NORMAL')
+    conn.execute(f'PRAGMA cache_size = -{int(config.DB_CACHE_KB)}')
+    conn.execute(f'PRAGMA mmap_size = {int(config.DB_MMAP_BYTES)}')
+    return conn
+
+
+class PoolConexoes:
+    """
+    Guarda as conexoes livres em uma fila (a mais recente e reutilizada primeiro,
+    com o cache de paginas ainda quente). Se nao houver conexao livre abre outra,
+    e so mantem guardadas ate 'tamanho' conexoes.
+    """
+
+    def __init__(self, caminho: str, tamanho: int):
+        self.caminho = caminho
+        self.livres = queue.LifoQueue(maxsize=tamanho)
+
+    def pegar(self) -> sqlite3.Connection:
+        try:
+            return self.livres.get_nowait()
+        except queue.Empty:
+            return nova_conexao(self.caminho)
+
+    def devolver(self, conn: sqlite3.Connection) -> None:
+        if conn.in_transaction:
+            conn.rollback()
+        try:
+            self.livres.put_nowait(conn)
+        except queue.Full:
+            conn.close()
+
+    def fechar(self) -> None:
+        while True:
+            try:
+                self.livres.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+# um pool por processo e por arquivo de banco: conexoes sqlite nao podem
+# atravessar um fork, entao cada worker abre as suas
+_pools = {}
+_trava = threading.Lock()
+
+
+def obter_pool(caminho=None) -> PoolConexoes:
+    chave = (os.getpid(), caminho or config.DB_PATH)
+    pool = _pools.get(chave)
+    if pool is None:
+        with _trava:
+            pool = _pools.setdefault(chave, PoolConexoes(chave[1], config.DB_POOL_TAMANHO))
+    return pool
+
+
+@contextmanager
+def conexao(caminho=None):
+    """
+    Empresta uma conexao do pool. Assim como 'with sqlite3.connect(...)',
+    faz commit ao sair sem erro e rollback se der erro
+    """
+    pool = obter_pool(caminho)
+    conn = pool.pegar()
+    try:
+        with conn:
+            yield conn
+    finally:
+        pool.devolver(conn)
+
+
+def criar_versao(cursor) -> None:
+    """
+    Tabela com um unico contador: toda gravacao nos dados incrementa a geracao,
+    e os caches (graficos, correlacao...) usam esse numero como chave
+    """
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS versao_dados (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            geracao INTEGER NOT NULL
+        )
+    ''')
+    cursor.execute('INSERT OR IGNORE INTO versao_dados (id, geracao) VALUES (1, 0)')
+
+
+def versao_dados(conn) -> int:
+    linha = conn.execute('SELECT geracao FROM versao_dados WHERE id = 1').fetchone()
+    return linha[0] if linha else 0
+
+
+def incrementar_versao(conn) -> None:
+    conn.execute('UPDATE versao_dados SET geracao = geracao + 1 WHERE id = 1')
+
+
+# tabela de resumo mensal de cada tabela base e a coluna do resumo que
+# representa o valor gravado na base (ultimo valor ou media do mes)
+RESUMOS = {
+    'inadimplencia': ('inadimplencia_mensal', 'ultimo'),
+    'selic': ('selic_mensal', 'media')
+}
+COLUNAS_RESUMO = ['media', 'minimo', 'maximo', 'contagem', 'ultimo']
+
+
+def criar_resumo(cursor, tabela: str, coluna: str) -> None:
+    """
+    Cria a tabela de resumo mensal (media, minimo, maximo, contagem e ultimo)
+    de uma tabela base. Quando a tabela e nova, ela e preenchida com os meses
+    que ja estao na base (contagem 1, pois a base so guarda um valor por mes).
+    O INSERT OR IGNORE deixa o preenchimento seguro se outro processo ja o fez
+    """
+    resumo = RESUMOS[tabela][0]
+    existe = cursor.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (resumo,)
+    ).fetchone()
+    cursor.execute(f'''
+        CREATE TABLE IF NOT EXISTS {resumo} (
+            mes TEXT PRIMARY KEY,
+            media REAL,
+            minimo REAL,
+            maximo REAL,
+            contagem INTEGER,
+            ultimo REAL
+        )
+    ''')
+    if not existe:
+        cursor.execute(f'''
+            INSERT OR IGNORE INTO {resumo} (mes, media, minimo, maximo, contagem, ultimo)
+            SELECT mes, {coluna}, {coluna}, {coluna}, 1, {coluna} FROM {tabela}
+        ''')
+
+
+def atualizar_resumos(conn, tabela: str, linhas) -> None:
+    """
+    Mantem o resumo em dia quando meses da base sao editados manualmente.
+    'linhas' sao pares (valor, mes). O valor editado substitui o mes inteiro:
+    media, minimo, maximo e ultimo passam a ser o valor e a contagem 1,
+    assim a linha do resumo nunca contradiz a si mesma
+    """
+    resumo = RESUMOS[tabela][0]
+    conn.executemany(f'''
+        UPDATE {resumo}
+        SET media = ?1, minimo = ?1, maximo = ?1, ultimo = ?1, contagem = 1
+        WHERE mes = ?2
+    ''', linhas)
+
+
+def atualizar_resumo(conn, tabela: str, mes: str, valor: float) -> None:
+    atualizar_resumos(conn, tabela, [(valor, mes)])
@@ -0,0 +1,65 @@
+'''
+Compara a conversao de datas dd/mm/AAAA do upload: pd.to_datetime + to_period('M').astype(str)
+contra ingestao.meses_de_datas (mes inteiro AAAAMM, cada data unica convertida uma vez)
+Uso: python benchmark_datas.py [--linhas 1000000] [--repeticoes 5] [--dias-distintos 0]
+Autor: Luis Henrique Ponciano
+'''
+
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from ingestao import meses_de_datas, formatar_meses
+
+
+def gerar_datas(linhas: int, dias_distintos: int) -> pd.Series:
+    """
+    Serie de textos dd/mm/AAAA. dias_distintos 0 = todas as datas diferentes
+    (arquivo diario); um numero pequeno simula muitas linhas por data
+    """
+    dias = dias_distintos or linhas
+    datas = pd.date_range('1990-01-01', periods=dias, freq='D').strftime('%d/%m/%Y')
+    return pd.Series(np.resize(datas.to_numpy(dtype=object), linhas))
+
+
+def atual(datas: pd.Series):
+    return pd.to_datetime(datas, format="%d/%m/%Y").dt.to_period('M').astype(str)
+
+
+def rapido(datas: pd.Series):
+    return meses_de_datas(datas)
+
+
+def cronometrar(funcao, datas, repeticoes: int) -> float:
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        funcao(datas)
+        tempos.append(time.perf_counter() - inicio)
+    return min(tempos)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark da conversao de datas do upload')
+    parser.add_argument('--linhas', type=int, default=1_000_000)
+    parser.add_argument('--repeticoes', type=int, default=5)
+    parser.add_argument('--dias-distintos', type=int, default=0,
+                        help='quantidade de datas diferentes (0 = todas diferentes)')
+    args = parser.parse_args()
+
+    datas = gerar_datas(args.linhas, args.dias_distintos)
+    # as duas conversoes precisam chegar nos mesmos meses
+    if formatar_meses(rapido(datas)) != atual(datas).tolist():
+        raise SystemExit('meses_de_datas diverge do pd.to_datetime')
+
+    t_atual = cronometrar(atual, datas, args.repeticoes)
+    t_rapido = cronometrar(rapido, datas, args.repeticoes)
+    print(f'{args.linhas:,} linhas, {datas.nunique():,} datas distintas')
+    print(f'   to_datetime + to_period  {t_atual * 1000:10.1f} ms')
+    print(f'   meses_de_datas           {t_rapido * 1000:10.1f} ms   {t_atual / t_rapido:6.1f}x mais rapido')
+
+
+if __name__ == '__main__':
+    main()
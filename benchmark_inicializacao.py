@@ -0,0 +1,87 @@
+'''
+Mede quanto custa subir o app do main2.py: tempo total do "import main2"
+e o custo de cada modulo importado (python -X importtime)
+Uso: python benchmark_inicializacao.py [--modulo main2] [--repeticoes 5] [--saida custo.json]
+Autor: Luis Henrique Ponciano
+'''
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+PASTA = os.path.dirname(os.path.abspath(__file__))
+
+
+def importar(modulo: str):
+    """
+    Importa o modulo em um processo novo (inicializacao a frio)
+    e devolve o tempo total e a saida do -X importtime
+    """
+    inicio = time.perf_counter()
+    processo = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {modulo}'],
+        cwd = PASTA,
+        capture_output = True,
+        text = True
+    )
+    total = time.perf_counter() - inicio
+    if processo.returncode != 0:
+        raise SystemExit(processo.stderr)
+    return total, processo.stderr
+
+
+def custo_por_modulo(saida: str) -> dict:
+    """
+    Le as linhas 'import time: self [us] | cumulative | imported package'
+    e devolve o tempo acumulado (em ms) do modulo medido e de cada import direto dele
+    """
+    custos = {}
+    for linha in saida.splitlines():
+        if not linha.startswith('import time:') or 'imported package' in linha:
+            continue
+        _, acumulado, nome = linha[len('import time:'):].split('|')
+        # cada nivel de import aninhado acrescenta dois espacos antes do nome
+        nivel = (len(nome) - len(nome.lstrip()) - 1) // 2
+        if nivel <= 1:
+            custos[nome.strip()] = custos.get(nome.strip(), 0.0) + int(acumulado) / 1000
+    return custos
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Custo de inicializacao do app')
+    parser.add_argument('--modulo', default='main2')
+    parser.add_argument('--repeticoes', type=int, default=5)
+    parser.add_argument('--top', type=int, default=15)
+    parser.add_argument('--saida', help='grava o resultado em JSON')
+    args = parser.parse_args()
+
+    totais = []
+    custos = {}
+    for _ in range(args.repeticoes):
+        total, saida = importar(args.modulo)
+        totais.append(total * 1000)
+        for pacote, ms in custo_por_modulo(saida).items():
+            custos.setdefault(pacote, []).append(ms)
+
+    medianas = {pacote: statistics.median(v) for pacote, v in custos.items()}
+    print(f"import {args.modulo}: mediana {statistics.median(totais):.1f} ms "
+          f"(min {min(totais):.1f} ms, {args.repeticoes} execucoes, inclui subir o interpretador)")
+    print(f"{'modulo':<30}{'ms':>10}")
+    for pacote, ms in sorted(medianas.items(), key=lambda p: -p[1])[:args.top]:
+        print(f"{pacote:<30}{ms:>10.1f}")
+
+    if args.saida:
+        with open(args.saida, 'w', encoding='utf-8') as f:
+            json.dump({
+                'modulo': args.modulo,
+                'total_ms': statistics.median(totais),
+                'modulos_ms': medianas
+            }, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,234 @@
+'''
+Benchmark do interpretador Quarteto (parse.py)
+Mede compilacao, execucao (instrucoes executadas por segundo), tempo por operacao e memoria alocada
+Uso:
+    python benchmark_quarteto.py                      # roda todas as cargas
+    python benchmark_quarteto.py --salvar base.json   # guarda os numeros como referencia
+    python benchmark_quarteto.py --comparar base.json # compara com a referencia
+    python benchmark_quarteto.py --perfil             # mostra o cProfile de cada carga
+Autor: Luis Henrique Ponciano
+'''
+
+import argparse
+import cProfile
+import json
+import pstats
+import time
+import tracemalloc
+
+import parse
+
+NOMES_OPERACOES = {
+    parse.DEFINIR: 'definir',
+    parse.MOSTRAR: 'mostrar',
+    parse.SE: 'se',
+    parse.ENQUANTO: 'enquanto',
+    parse.ERRO: 'erro',
+}
+
+
+def carga_definir_mostrar(n=20000):
+    linhas = []
+    for i in range(n):
+        linhas.append(f'definir v{i % 50} como "valor {i}"')
+        linhas.append(f'mostrar "linha " + v{i % 50} + " fim"')
+    return '\n'.join(linhas), 1
+
+
+def carga_se_aninhado(profundidade=50, n=2000):
+    linha = 'se verdadeiro então ' * profundidade + 'mostrar "fundo"'
+    return '\n'.join([linha] * n), 1
+
+
+def carga_enquanto(voltas=100000):
+    codigo = '\n'.join([
+        'definir continuar como "verdadeiro"',
+        'enquanto continuar faça mostrar "volta " + continuar',
+    ])
+    return codigo, voltas
+
+
+CARGAS = {
+    'definir_mostrar': carga_definir_mostrar,
+    'se_aninhado': carga_se_aninhado,
+    'enquanto': carga_enquanto,
+}
+
+
+# operacao que nao faz nada, so para calibrar o custo da medicao
+NADA = -1
+
+
+class MaquinaMedida(parse.Maquina):
+    # conta as instrucoes executadas e o tempo proprio de cada operacao
+    # (o tempo do bloco de um 'se'/'enquanto' fica com as instrucoes do bloco).
+    # Cronometrar cada instrucao tem custo: parte cai dentro do intervalo medido
+    # da propria instrucao (custo_dentro) e parte fora dele, no tempo de quem a
+    # executou (custo_fora). calibrar() mede os dois e executar() os desconta,
+    # senao o 'se'/'enquanto' ficariam com o custo do relogio de cada filho
+    custo_dentro = 0.0
+    custo_fora = 0.0
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.tempos = {}
+        self.contagem = {}
+        self.filhos = 0.0
+
+    def executar(self, programa):
+        despacho = self.despacho
+        relogio = time.perf_counter
+        for instrucao in programa:
+            op = instrucao[0]
+            antes = self.filhos
+            self.filhos = 0.0
+            inicio = relogio()
+            despacho[op](instrucao)
+            total = relogio() - inicio
+            self.tempos[op] = self.tempos.get(op, 0.0) + total - self.filhos - self.custo_dentro
+            self.contagem[op] = self.contagem.get(op, 0) + 1
+            self.filhos = antes + total + self.custo_fora
+
+    @classmethod
+    def calibrar(cls, instrucoes=100000, repeticoes=5):
+        """
+        Roda um programa de instrucoes que nao fazem nada com e sem medicao:
+        a diferenca por instrucao e o custo total da medicao, e o custo de uma
+        chamada do relogio e a parte que fica dentro do intervalo medido
+        """
+        cls.custo_dentro = cls.custo_fora = 0.0
+        programa = ((NADA,),) * instrucoes
+
+        def rodar(classe):
+            maquina = classe({})
+            maquina.despacho[NADA] = descartar
+            return _cronometrar(lambda: maquina.executar(programa))
+
+        simples = min(rodar(parse.Maquina) for _ in range(repeticoes))
+        medida = min(rodar(cls) for _ in range(repeticoes))
+        relogio = time.perf_counter
+        chamadas = []
+        for _ in range(repeticoes):
+            inicio = relogio()
+            for _ in range(instrucoes):
+                relogio()
+            chamadas.append(relogio() - inicio)
+        # o laco vazio entra junto com o relogio (estimativa um pouco por cima)
+        por_chamada = min(chamadas) / instrucoes
+        custo = max(medida - simples, 0.0) / instrucoes
+        cls.custo_dentro = min(por_chamada, custo)
+        cls.custo_fora = custo - cls.custo_dentro
+
+
+def descartar(texto):
+    pass
+
+
+def nova_maquina(classe, max_iteracoes):
+    return classe({}, max_iteracoes, parse.SaidaBufferizada(descartar, 4096))
+
+
+def medir(codigo, max_iteracoes, repeticoes):
+    # compilacao: sempre do zero, sem passar pelo cache de programas
+    compilacao = min(_cronometrar(lambda: parse.compilar(codigo)) for _ in range(repeticoes))
+    programa = parse.compilar(codigo)
+
+    def rodar():
+        maquina = nova_maquina(parse.Maquina, max_iteracoes)
+        maquina.executar(programa)
+        maquina.saida.descarregar()
+
+    execucao = min(_cronometrar(rodar) for _ in range(repeticoes))
+
+    if not MaquinaMedida.custo_dentro:
+        MaquinaMedida.calibrar()
+    medida = nova_maquina(MaquinaMedida, max_iteracoes)
+    medida.executar(programa)
+    instrucoes = sum(medida.contagem.values())
+
+    tracemalloc.start()
+    rodar()
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        'linhas_fonte': sum(1 for l in codigo.split('\n') if l.strip()),
+        'instrucoes': instrucoes,
+        'compilacao_s': compilacao,
+        'execucao_s': execucao,
+        'instrucoes_por_s': instrucoes / execucao if execucao else 0.0,
+        'pico_memoria_kb': pico / 1024,
+        'operacoes': {
+            NOMES_OPERACOES[op]: {
+                'contagem': medida.contagem[op],
+                'tempo_s': medida.tempos[op],
+            } for op in medida.contagem
+        },
+    }
+
+
+def _cronometrar(funcao):
+    inicio = time.perf_counter()
+    funcao()
+    return time.perf_counter() - inicio
+
+
+def perfil(codigo, max_iteracoes, top=15):
+    programa = parse.compilar(codigo)
+    maquina = nova_maquina(parse.Maquina, max_iteracoes)
+    perfilador = cProfile.Profile()
+    perfilador.runcall(maquina.executar, programa)
+    pstats.Stats(perfilador).sort_stats('cumulative').print_stats(top)
+
+
+def mostrar_resultado(nome, r, base=None):
+    print(f"\n== {nome}: {r['linhas_fonte']} linhas, {r['instrucoes']} instrucoes executadas")
+    print(f"   compilacao  {r['compilacao_s'] * 1000:10.2f} ms")
+    print(f"   execucao    {r['execucao_s'] * 1000:10.2f} ms   {r['instrucoes_por_s']:,.0f} instrucoes/s")
+    print(f"   pico memoria {r['pico_memoria_kb']:9.1f} KB")
+    for op, v in sorted(r['operacoes'].items(), key=lambda o: -o[1]['tempo_s']):
+        por_op = v['tempo_s'] / v['contagem'] * 1e9
+        print(f"   {op:<10} {v['contagem']:>10} x {por_op:8.0f} ns")
+    if base:
+        for campo in ('compilacao_s', 'execucao_s', 'pico_memoria_kb'):
+            if base.get(campo):
+                variacao = (r[campo] / base[campo] - 1) * 100
+                print(f"   vs base {campo:<16} {variacao:+7.1f}%")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark do interpretador Quarteto')
+    parser.add_argument('cargas', nargs='*', help=f"cargas a rodar (padrao: todas): {', '.join(CARGAS)}")
+    parser.add_argument('--repeticoes', type=int, default=5)
+    parser.add_argument('--salvar', help='grava os resultados em JSON')
+    parser.add_argument('--comparar', help='JSON de uma execucao anterior (--salvar)')
+    parser.add_argument('--perfil', action='store_true', help='mostra o cProfile de cada carga')
+    args = parser.parse_args()
+    for nome in args.cargas:
+        if nome not in CARGAS:
+            parser.error(f'carga desconhecida: {nome}')
+
+    base = {}
+    if args.comparar:
+        with open(args.comparar, encoding='utf-8') as f:
+            base = json.load(f)
+
+    MaquinaMedida.calibrar()
+    print(f"custo da medicao por instrucao (descontado do tempo por operacao): "
+          f"{MaquinaMedida.custo_dentro * 1e9:.0f} ns dentro + {MaquinaMedida.custo_fora * 1e9:.0f} ns fora")
+
+    resultados = {}
+    for nome in args.cargas or list(CARGAS):
+        codigo, max_iteracoes = CARGAS[nome]()
+        resultados[nome] = medir(codigo, max_iteracoes, args.repeticoes)
+        mostrar_resultado(nome, resultados[nome], base.get(nome))
+        if args.perfil:
+            perfil(codigo, max_iteracoes)
+
+    if args.salvar:
+        with open(args.salvar, 'w', encoding='utf-8') as f:
+            json.dump(resultados, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,50 @@
+'''
+Cache LRU em memoria para resultados que so mudam quando os dados mudam
+Autor: Luis Henrique Ponciano
+'''
+
+import threading
+from collections import OrderedDict
+
+
+class CacheLRU:
+    """
+    Dicionario com limite de itens: ao passar do limite descarta
+    o item usado ha mais tempo. Seguro para varias threads do Flask
+    """
+
+    def __init__(self, tamanho: int):
+        self.tamanho = tamanho
+        self.itens = OrderedDict()
+        self.trava = threading.Lock()
+
+    def obter(self, chave, padrao=None):
+        with self.trava:
+            if chave not in self.itens:
+                return padrao
+            self.itens.move_to_end(chave)
+            return self.itens[chave]
+
+    def guardar(self, chave, valor) -> None:
+        with self.trava:
+            self.itens[chave] = valor
+            self.itens.move_to_end(chave)
+            while len(self.itens) > self.tamanho:
+                self.itens.popitem(last=False)
+
+    def obter_ou_calcular(self, chave, calcular):
+        """
+        Devolve o valor guardado ou chama calcular() e guarda o resultado
+        """
+        valor = self.obter(chave, _ausente)
+        if valor is _ausente:
+            valor = calcular()
+            self.guardar(chave, valor)
+        return valor
+
+    def limpar(self) -> None:
+        with self.trava:
+            self.itens.clear()
+
+
+_ausente = object()
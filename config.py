@@ -18,5 +18,67 @@ ROTAS = [
 '/editar_inadimplencia',            # rota 05
     '/correlacao',                  # rota 06
     '/grafico3d',                   # rota 07
-    '/editar_selic'                 # rota 08
+    '/editar_selic',                # rota 08
+    '/api/series',                  # rota 09
+    '/assets/<versao>/plotly.min.js', # rota 10
+    '/upload/status/<tarefa_id>',   # rota 11
+    '/metrics',                     # rota 12
+    '/editar_lote'                  # rota 13
     ]
+
+# quantidade de linhas lidas por vez no /upload (None le o arquivo inteiro)
+UPLOAD_LINHAS_POR_BLOCO = 50000
+
+# /upload em segundo plano: grava os arquivos, devolve o id da tarefa e a ingestao
+# roda em outra thread (o progresso fica na rota 11). O formulario pode pedir
+# o modo com assincrono=1 / assincrono=0
+UPLOAD_ASSINCRONO = False
+UPLOAD_TRABALHADORES = 2            # ingestoes rodando ao mesmo tempo
+UPLOAD_PASTA = None                 # onde os arquivos esperam a tarefa (None = pasta temporaria do sistema)
+UPLOAD_HISTORICO = 100              # tarefas terminadas lembradas pela rota de status
+
+# pool de conexoes do sqlite (banco.py)
+DB_POOL_TAMANHO = 8                 # conexoes livres guardadas por processo
+DB_TIMEOUT = 30                     # segundos esperando o lock de escrita
+DB_WAL = True                       # journal_mode=WAL
+DB_CACHE_KB = 64000                 # cache de paginas por conexao
+DB_MMAP_BYTES = 256 * 1024 * 1024   # leitura do arquivo via mmap
+DB_CACHED_STATEMENTS = 256          # comandos preparados reaproveitados
+
+# quantas versoes renderizadas dos graficos ficam em memoria
+CACHE_GRAFICOS_TAMANHO = 16
+
+# /graficos e /api/series: pontos por serie depois da reducao LTTB
+# (/graficos?inicio=AAAA-MM&fim=AAAA-MM&pontos=N aproxima uma janela com mais detalhe)
+GRAFICOS_PONTOS = 1000
+GRAFICOS_PONTOS_MAXIMO = 10000
+
+# respostas da /api/series maiores que isso (bytes) vao com gzip
+API_GZIP_MINIMO = 1024
+
+# paginacao do /consultar (linhas por pagina)
+CONSULTA_TAMANHO_PAGINA = 100
+CONSULTA_TAMANHO_MAXIMO = 1000
+
+# /correlacao: janela movel (meses) e maior antecedencia da selic testada
+CORRELACAO_JANELA = 12
+CORRELACAO_DEFASAGEM_MAXIMA = 24
+
+# /grafico3d: KMeans (GRAFICO3D_K = None escolhe k pela silhueta)
+GRAFICO3D_K = None
+GRAFICO3D_K_MAXIMO = 6
+GRAFICO3D_LIMITE_MINIBATCH = 1000     # acima disso usa MiniBatchKMeans
+CACHE_MODELOS_TAMANHO = 4
+
+# de onde os graficos carregam o plotly.js:
+# 'cdn'   -> da internet (cdn.plot.ly)
+# 'local' -> uma copia unica: servida pelo Flask na rota 10 (com cache longo no navegador)
+#            e gravada como plotly.min.js na pasta dos mapas gerados pelo main.py
+PLOTLY_JS = 'cdn'
+
+# metricas de tempo no formato do Prometheus (rota 12)
+METRICAS_ATIVAS = True              # tempo por rota e por etapa (pandas / plotly)
+METRICAS_SQL = True                 # tempo de cada comando SQL (conexoes do banco.py)
+METRICAS_SQL_TAMANHO = 120          # caracteres do comando usados como rotulo
+METRICAS_SQL_MAXIMO = 200           # comandos distintos medidos; os seguintes entram como 'outros'
+METRICAS_LIMITES = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)  # segundos
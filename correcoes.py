@@ -0,0 +1,140 @@
+'''
+Edicao em lote: aplica varias correcoes (mes, valor) de inadimplencia e selic em uma unica transacao
+Autor: Luis Henrique Ponciano
+'''
+
+import csv
+import io
+import json
+import re
+
+from banco import atualizar_resumos
+
+# coluna de valor de cada tabela base
+COLUNAS = {
+    'inadimplencia': 'inadimplencia',
+    'selic': 'selic_diaria'
+}
+FORMATO_MES = re.compile(r'^\d{4}-(0[1-9]|1[0-2])$')
+ERROS_TEXTO = {
+    'tabela': 'Tabela invalida',
+    'mes': 'Mes invalido'
+}
+
+
+def ler_correcoes_csv(texto: str, tabela_padrao=None) -> list:
+    """
+    CSV separado por ';' (como os arquivos do upload) com cabecalho
+    'tabela;mes;valor' ou so 'mes;valor' (a tabela vem de tabela_padrao)
+    """
+    leitor = csv.DictReader(io.StringIO(texto.lstrip('\ufeff')), delimiter=';')
+    return [
+        {
+            'tabela': (linha.get('tabela') or tabela_padrao or '').strip(),
+            'mes': (linha.get('mes') or '').strip(),
+            'valor': linha.get('valor')
+        }
+        for linha in leitor
+    ]
+
+
+def ler_correcoes_json(dados, tabela_padrao=None) -> list:
+    """
+    Aceita uma lista de correcoes ou {"tabela": ..., "correcoes": [...]}.
+    Cada correcao e {"tabela", "mes", "valor"} ou [mes, valor]
+    """
+    if isinstance(dados, str):
+        dados = json.loads(dados)
+    if isinstance(dados, dict):
+        tabela_padrao = dados.get('tabela', tabela_padrao)
+        dados = dados.get('correcoes', [])
+    correcoes = []
+    for item in dados:
+        if isinstance(item, dict):
+            tabela, mes, valor = item.get('tabela', tabela_padrao), item.get('mes'), item.get('valor')
+        elif isinstance(item, (list, tuple)):
+            tabela = tabela_padrao
+            mes, valor = (list(item) + [None, None])[:2]
+        else:
+            correcoes.append({'tabela': '', 'mes': '', 'valor': None, 'erro': f'Correcao invalida: {json.dumps(item)}'})
+            continue
+        correcao = {'tabela': tabela or '', 'mes': mes or '', 'valor': valor}
+        # tabela e mes precisam ser texto: o resto vira erro da linha
+        for campo in ('tabela', 'mes'):
+            if isinstance(correcao[campo], str):
+                correcao[campo] = correcao[campo].strip()
+            else:
+                correcao['erro'] = f"{ERROS_TEXTO[campo]}: {json.dumps(correcao[campo])}"
+                correcao[campo] = json.dumps(correcao[campo])
+        correcoes.append(correcao)
+    return correcoes
+
+
+def _validar(correcao: dict):
+    # retorna (tabela, mes, valor) ou a mensagem de erro da linha
+    if 'erro' in correcao:
+        return correcao['erro']
+    tabela = correcao['tabela']
+    if tabela not in COLUNAS:
+        return f"Tabela invalida: '{tabela}'"
+    if not FORMATO_MES.match(correcao['mes']):
+        return f"Mes invalido: '{correcao['mes']}' (use AAAA-MM)"
+    valor = correcao['valor']
+    try:
+        valor = float(valor.replace(',', '.')) if isinstance(valor, str) else float(valor)
+    except (TypeError, ValueError):
+        return f"Valor invalido: '{valor}'"
+    return tabela, correcao['mes'], valor
+
+
+def aplicar_correcoes(conn, correcoes: list) -> list:
+    """
+    Valida as correcoes e grava as validas na base e no resumo mensal com
+    executemany, sem commit (quem chama decide a transacao). Se o mesmo mes
+    aparece mais de uma vez vale a ultima linha. Retorna o resultado de cada linha:
+    'alterado', 'sem mudanca', 'mes inexistente', 'ignorado (repetido)' ou o erro
+    """
+    resultados = []
+    # ultima linha valida de cada (tabela, mes)
+    finais = {}
+    for posicao, correcao in enumerate(correcoes):
+        validada = _validar(correcao)
+        resultado = {'linha': posicao + 1, 'tabela': correcao['tabela'], 'mes': correcao['mes']}
+        if isinstance(validada, str):
+            resultado['resultado'] = 'erro'
+            resultado['erro'] = validada
+        else:
+            tabela, mes, valor = validada
+            resultado['valor'] = valor
+            anterior = finais.get((tabela, mes))
+            if anterior is not None:
+                resultados[anterior]['resultado'] = 'ignorado (repetido)'
+            finais[(tabela, mes)] = posicao
+        resultados.append(resultado)
+
+    for tabela, coluna in COLUNAS.items():
+        posicoes = [p for (t, _), p in finais.items() if t == tabela]
+        if not posicoes:
+            continue
+        meses = [resultados[p]['mes'] for p in posicoes]
+        atuais = dict(conn.execute(
+            f'SELECT mes, {coluna} FROM {tabela} WHERE mes IN (SELECT value FROM json_each(?))',
+            (json.dumps(meses),)
+        ))
+
+        linhas = []
+        for p in posicoes:
+            r = resultados[p]
+            if r['mes'] not in atuais:
+                r['resultado'] = 'mes inexistente'
+            elif atuais[r['mes']] == r['valor']:
+                r['resultado'] = 'sem mudanca'
+            else:
+                r['resultado'] = 'alterado'
+                r['valor_anterior'] = atuais[r['mes']]
+                linhas.append((r['valor'], r['mes']))
+
+        if linhas:
+            conn.executemany(f'UPDATE {tabela} SET {coluna} = ? WHERE mes = ?', linhas)
+            atualizar_resumos(conn, tabela, linhas)
+    return resultados
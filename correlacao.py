@@ -0,0 +1,106 @@
+'''
+Correlacao e regressao entre selic e inadimplencia, calculadas com somas acumuladas
+Autor: Luis Henrique Ponciano
+'''
+
+import numpy as np
+
+
+def _somas_moveis(v: np.ndarray, janela: int) -> np.ndarray:
+    """
+    Soma de cada janela de tamanho 'janela' usando uma unica soma acumulada
+    """
+    acumulada = np.concatenate(([0.0], np.cumsum(v)))
+    return acumulada[janela:] - acumulada[:-janela]
+
+
+def regressao_movel(x: np.ndarray, y: np.ndarray, janela: int) -> dict:
+    """
+    Para cada janela de 'janela' meses calcula a correlacao de pearson entre x e y
+    e a reta y = beta * x + intercepto. Os arrays devolvidos tem len(x) - janela + 1
+    posicoes (a posicao i corresponde a janela que termina no mes i + janela - 1)
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    if janela < 2 or len(x) < janela:
+        vazio = np.array([], dtype=float)
+        return dict(correlacao=vazio, beta=vazio, intercepto=vazio)
+
+    # centraliza antes de somar para nao perder precisao nas diferencas das somas
+    cx, cy = x.mean(), y.mean()
+    x = x - cx
+    y = y - cy
+
+    mx = _somas_moveis(x, janela) / janela
+    my = _somas_moveis(y, janela) / janela
+    cov = _somas_moveis(x * y, janela) / janela - mx * my
+    var_x = _somas_moveis(x * x, janela) / janela - mx * mx
+    var_y = _somas_moveis(y * y, janela) / janela - my * my
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        correlacao = cov / np.sqrt(var_x * var_y)
+        beta = cov / var_x
+    # serie constante na janela: nao existe correlacao nem inclinacao
+    constante = (var_x <= 1e-12) | (var_y <= 1e-12)
+    correlacao[constante] = np.nan
+    beta[var_x <= 1e-12] = np.nan
+    intercepto = (my + cy) - beta * (mx + cx)
+    return dict(correlacao=np.clip(correlacao, -1, 1), beta=beta, intercepto=intercepto)
+
+
+def correlacao_defasada(x: np.ndarray, y: np.ndarray, defasagem_maxima: int) -> np.ndarray:
+    """
+    Correlacao entre x no mes t e y no mes t + k para k = 0 .. defasagem_maxima
+    (x antecipando y). Todas as defasagens saem de um np.correlate e de somas acumuladas
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    n = len(x)
+    k = np.arange(defasagem_maxima + 1)
+    if n == 0:
+        return np.full(len(k), np.nan)
+    x = x - x.mean()
+    y = y - y.mean()
+
+    # cruzada[k] = soma de x[t] * y[t + k]
+    cruzada = np.correlate(y, x, mode='full')[n - 1:]
+    cruzada = np.concatenate((cruzada, np.zeros(max(0, len(k) - n))))[:len(k)]
+
+    sx, sxx = np.concatenate(([0.0], np.cumsum(x))), np.concatenate(([0.0], np.cumsum(x * x)))
+    sy, syy = np.concatenate(([0.0], np.cumsum(y))), np.concatenate(([0.0], np.cumsum(y * y)))
+    pares = np.clip(n - k, 0, None)
+    fim_x = pares                                  # x[0 : n-k]
+    inicio_y = np.minimum(k, n)                    # y[k : n]
+
+    soma_x = sx[fim_x]
+    soma_xx = sxx[fim_x]
+    soma_y = sy[n] - sy[inicio_y]
+    soma_yy = syy[n] - syy[inicio_y]
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        cov = cruzada - soma_x * soma_y / pares
+        var_x = soma_xx - soma_x ** 2 / pares
+        var_y = soma_yy - soma_y ** 2 / pares
+        correlacao = cov / np.sqrt(var_x * var_y)
+    correlacao[(pares < 3) | (var_x <= 1e-12) | (var_y <= 1e-12)] = np.nan
+    return np.clip(correlacao, -1, 1)
+
+
+def analisar(x: np.ndarray, y: np.ndarray, janela: int, defasagem_maxima: int) -> dict:
+    """
+    Junta tudo que a rota /correlacao mostra: correlacao e reta da amostra inteira,
+    os valores moveis e a correlacao por defasagem
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    geral = regressao_movel(x, y, len(x))
+    correl = float(geral['correlacao'][0]) if len(geral['correlacao']) else float('nan')
+    m = float(geral['beta'][0]) if len(geral['beta']) else float('nan')
+    b = float(geral['intercepto'][0]) if len(geral['intercepto']) else float('nan')
+    return dict(
+        correlacao = correl,
+        inclinacao = m,
+        intercepto = b,
+        movel = regressao_movel(x, y, janela),
+        defasada = correlacao_defasada(x, y, defasagem_maxima)
+    )
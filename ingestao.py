@@ -0,0 +1,185 @@
+'''
+Ingestão em blocos dos arquivos CSV de inadimplencia e selic
+Autor: Luis Henrique Ponciano
+'''
+
+import pandas as pd
+import numpy as np
+
+from banco import RESUMOS, COLUNAS_RESUMO
+
+
+# dias de cada mes (indice 1 a 12) em ano nao bissexto
+DIAS_MES = np.array([0, 31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31])
+
+
+def meses_de_datas(datas) -> np.ndarray:
+    """
+    Converte datas dd/mm/AAAA no mes como inteiro AAAAMM (ex: '15/03/2024' -> 202403).
+    - cada data diferente e convertida uma unica vez (pd.factorize)
+    - dia, mes e ano saem direto dos caracteres com operacoes do numpy, sem criar datetimes
+    - o que nao esta no formato fixo (ex: '1/3/2024') vai para o pd.to_datetime,
+      que continua acusando as datas invalidas
+    - datas vazias viram 0
+    """
+    codigos, unicos = pd.factorize(pd.Series(datas))
+    unicos = np.asarray(unicos, dtype=str)
+    chaves = np.zeros(len(unicos), dtype=np.int64)
+
+    fixos = np.char.str_len(unicos) == 10
+    # cada caractere vira seu codigo (uint32 do texto unicode) menos o do '0'
+    c = unicos[fixos].astype('U10').view(np.uint32).reshape(-1, 10).astype(np.int64) - ord('0')
+    dia = c[:, 0] * 10 + c[:, 1]
+    mes = c[:, 3] * 10 + c[:, 4]
+    ano = c[:, 6] * 1000 + c[:, 7] * 100 + c[:, 8] * 10 + c[:, 9]
+    digitos = c[:, [0, 1, 3, 4, 6, 7, 8, 9]]
+    bissexto = (ano % 4 == 0) & ((ano % 100 != 0) | (ano % 400 == 0))
+    validos = (
+        ((digitos >= 0) & (digitos <= 9)).all(axis=1)
+        & (c[:, 2] == ord('/') - ord('0')) & (c[:, 5] == ord('/') - ord('0'))
+        & (mes >= 1) & (mes <= 12) & (dia >= 1)
+        & (dia <= DIAS_MES[np.clip(mes, 1, 12)] + (bissexto & (mes == 2)))
+    )
+    posicoes = np.flatnonzero(fixos)
+    chaves[posicoes[validos]] = ano[validos] * 100 + mes[validos]
+
+    resto = np.ones(len(unicos), dtype=bool)
+    resto[posicoes[validos]] = False
+    if resto.any():
+        datas_resto = pd.to_datetime(pd.Series(unicos[resto]), format="%d/%m/%Y")
+        chaves[resto] = (datas_resto.dt.year * 100 + datas_resto.dt.month).to_numpy()
+
+    # codigo -1 (data vazia) aponta para o 0 acrescentado no fim
+    return np.append(chaves, 0)[codigos]
+
+
+def formatar_meses(meses) -> list:
+    """
+    Mes inteiro AAAAMM no texto AAAA-MM gravado no banco (so para os meses unicos)
+    """
+    return [f'{m // 100:04d}-{m % 100:02d}' for m in np.asarray(meses, dtype=np.int64)]
+
+
+def ler_em_blocos(arquivo, coluna_valor: str, linhas_por_bloco=None):
+    """
+    Le o CSV (separado por ';' com data dd/mm/AAAA) em blocos de tamanho fixo.
+    - cada bloco ja vem com a coluna 'mes' como inteiro AAAAMM (meses_de_datas);
+      a coluna 'data' fica como texto e linhas sem data sao descartadas
+    - linhas_por_bloco None (ou 0) le o arquivo inteiro em um unico bloco
+    """
+    leitor = pd.read_csv(
+        arquivo,
+        sep = ';',
+        names = ['data', coluna_valor],
+        header = 0,
+        chunksize = linhas_por_bloco or None
+    )
+    if not linhas_por_bloco:
+        leitor = [leitor]
+
+    for bloco in leitor:
+        bloco['mes'] = meses_de_datas(bloco['data'])
+        if (bloco['mes'] == 0).any():
+            bloco = bloco[bloco['mes'] > 0]
+        yield bloco
+
+
+class AgregadorMensal:
+    """
+    Acumula, bloco a bloco, as estatisticas mensais de uma coluna.
+    Guarda apenas uma linha por mes (soma, contagem, min, max e ultimo valor),
+    entao a memoria nao cresce com o numero de linhas diarias.
+    """
+
+    def __init__(self, coluna_valor: str):
+        self.coluna_valor = coluna_valor
+        self.parcial = None
+
+    def adicionar(self, bloco: pd.DataFrame) -> None:
+        grupo = bloco.groupby('mes', sort=False)[self.coluna_valor]
+        atual = pd.DataFrame({
+            'soma': grupo.sum(),
+            'contagem': grupo.count(),
+            'minimo': grupo.min(),
+            'maximo': grupo.max(),
+            'ultimo': grupo.last()
+        })
+        if self.parcial is None:
+            self.parcial = atual
+            return
+
+        # junta o bloco atual com o acumulado (o bloco mais novo define o ultimo valor)
+        juntos = pd.concat([self.parcial, atual])
+        grupo = juntos.groupby(level=0, sort=False)
+        self.parcial = pd.DataFrame({
+            'soma': grupo['soma'].sum(),
+            'contagem': grupo['contagem'].sum(),
+            'minimo': grupo['minimo'].min(),
+            'maximo': grupo['maximo'].max(),
+            'ultimo': grupo['ultimo'].last()
+        })
+
+    def mensal(self) -> pd.DataFrame:
+        """
+        Retorna um DataFrame ordenado por mes com as colunas
+        mes, media, minimo, maximo, contagem e ultimo
+        """
+        if self.parcial is None:
+            return pd.DataFrame(columns=['mes', 'media', 'minimo', 'maximo', 'contagem', 'ultimo'])
+        out = self.parcial.sort_index()
+        contagem = out['contagem'].to_numpy()
+        media = np.divide(
+            out['soma'].to_numpy(dtype=float),
+            contagem,
+            out = np.full(len(out), np.nan),
+            where = contagem > 0
+        )
+        return pd.DataFrame({
+            'mes': formatar_meses(out.index),
+            'media': media,
+            'minimo': out['minimo'].to_numpy(),
+            'maximo': out['maximo'].to_numpy(),
+            'contagem': contagem.astype(int),
+            'ultimo': out['ultimo'].to_numpy()
+        })
+
+
+def salvar_mensal(conn, tabela: str, coluna: str, meses, valores) -> int:
+    """
+    Grava uma linha por mes com INSERT ... ON CONFLICT(mes) DO UPDATE.
+    - so reescreve os meses novos ou cujo valor mudou
+    - nao faz commit: quem chama decide a transacao
+    - retorna quantos meses foram inseridos ou alterados
+    """
+    linhas = [
+        (str(mes), None if pd.isna(valor) else float(valor))
+        for mes, valor in zip(meses, valores)
+    ]
+    antes = conn.total_changes
+    conn.executemany(f'''
+        INSERT INTO {tabela} (mes, {coluna}) VALUES (?, ?)
+        ON CONFLICT(mes) DO UPDATE SET {coluna} = excluded.{coluna}
+        WHERE {tabela}.{coluna} IS NOT excluded.{coluna}
+    ''', linhas)
+    return conn.total_changes - antes
+
+
+def salvar_resumo(conn, tabela: str, mensal: pd.DataFrame) -> int:
+    """
+    Grava no resumo mensal da tabela os meses vindos do AgregadorMensal.
+    Assim como salvar_mensal, so reescreve os meses novos ou alterados
+    """
+    resumo = RESUMOS[tabela][0]
+    linhas = [
+        (str(linha[0]),) + tuple(None if pd.isna(v) else float(v) for v in linha[1:])
+        for linha in mensal[['mes'] + COLUNAS_RESUMO].itertuples(index=False)
+    ]
+    atualiza = ', '.join(f'{c} = excluded.{c}' for c in COLUNAS_RESUMO)
+    mudou = ' OR '.join(f'{resumo}.{c} IS NOT excluded.{c}' for c in COLUNAS_RESUMO)
+    antes = conn.total_changes
+    conn.executemany(f'''
+        INSERT INTO {resumo} (mes, {', '.join(COLUNAS_RESUMO)}) VALUES (?, ?, ?, ?, ?, ?)
+        ON CONFLICT(mes) DO UPDATE SET {atualiza}
+        WHERE {mudou}
+    ''', linhas)
+    return conn.total_changes - antes
@@ -1,65 +1,129 @@
-# Mapa interativo de Custos (NY x RIO) com pontos e mapa de calor
+# Mapa interativo de Custos por cidade (NY x RIO por padrao) com pontos e mapa de calor
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import unicodedata
+from concurrent.futures import ProcessPoolExecutor
 
 import pandas as pd
 import numpy as np
 import plotly.graph_objs as go
 
+import config
+
+
+
+# nomes de coluna aceitos para cada campo, em ordem de preferencia
+COLUMN_CANDIDATES = {
+    'lat': ['lat','latitude','Latitude','LAT','Lat','LATITUDE'],
+    'lon': ['lon','longitude','Longitude','LON','Lon','Long','Lng'],
+    'custo': ['custo','valor','preço','preco','cost','valor_total','price'],
+    'nome': ['nome','descricao','titulo','name','title','local','place'],
+}
+# versao em minusculas, calculada uma vez, para a busca por trecho do nome
+_LOWER_CANDIDATES = {
+    field: list(dict.fromkeys(c.lower() for c in candidates))
+    for field, candidates in COLUMN_CANDIDATES.items()
+}
+
+
+def detect_columns(colnames) -> dict:
+    """
+    Escolhe a coluna de cada campo (lat, lon, custo, nome) so pelos nomes:
+    - primeiro um nome exato da lista de candidatos
+    - depois a primeira coluna que contem um candidato (sem diferenciar maiusculas)
+    Campos sem coluna ficam como None
+    """
+    colnames = list(colnames)
+    exact = set(colnames)
+    lowered = [(str(col).lower(), col) for col in colnames]
+
+    found = {}
+    for field, candidates in COLUMN_CANDIDATES.items():
+        found[field] = next((c for c in candidates if c in exact), None)
+        if found[field] is None:
+            found[field] = next(
+                (col for c in _LOWER_CANDIDATES[field] for low, col in lowered if c in low),
+                None
+            )
+    return found
+
+
+def read_city_csv(path: str) -> tuple:
+    """
+    Le do CSV so as colunas usadas: o cabecalho e lido sozinho primeiro para
+    detectar as colunas, e o resto do arquivo e carregado com usecols/dtype.
+    Devolve (DataFrame, colunas detectadas)
+    """
+    columns = detect_columns(pd.read_csv(path, nrows=0).columns)
+    if columns['lat'] is None or columns['lon'] is None:
+        raise ValueError(f"Não encontrei colunas de latitude e longitude em {path}")
+
+    usecols = [col for col in columns.values() if col is not None]
+    dtype = {columns[f]: np.float32 for f in ('lat', 'lon', 'custo') if columns[f] is not None}
+    if columns['nome'] is not None:
+        dtype[columns['nome']] = str
+    try:
+        df = pd.read_csv(path, usecols=usecols, dtype=dtype)
+    except ValueError:
+        # algum valor nao numerico: deixa o standardize_columns converter com errors='coerce'
+        df = pd.read_csv(path, usecols=usecols, dtype={c: t for c, t in dtype.items() if t is str})
+    return df, columns
 
 
-def standardize_columns(df: pd.DataFrame) -> pd.DataFrame:
+def standardize_columns(df: pd.DataFrame, columns: dict = None) -> pd.DataFrame:
     """
     Tentar detectar automaticamente as colunas latitude e longitude, custos e nome.
     Aceita varios nomes comuns como lat/latitude custo, valor e etc
     preenche custos ausentes com a mediana (ou 1 se tudo tiver ausente)
+    lat, lon e custo saem como float32 e so as linhas validas sao copiadas
+    columns: colunas ja detectadas (ex: por read_city_csv), para nao detectar de novo
     """
-    df = df.copy()
-
-    lat_candidates = ['lat','latitude','Latitude','LAT','Lat','LATITUDE']
-    lon_candidates = ['lon','longitude','Longitude','LON','Lon','Long','Lng']
-    cost_candidates = ['custo','valor','preço','preco','cost','valor_total','price']
-    name_candidates = ['nome','descricao','titulo','name','title','local','place']
-
-    def pick(colnames, candidates):
-        
-        for c in candidates:
-           
-            if c in colnames:
-                
-                return c
-          
-        for c in candidates:
-            
-            for col in colnames:
-               
-                if c.lower() in col.lower():
-                    
-                    return col
-        return None 
-        
-    lat_col = pick(df.columns, lat_candidates)
-    lon_col = pick(df.columns, lon_candidates)
-    cost_col = pick(df.columns, cost_candidates)
-    name_col = pick(df.columns, name_candidates)
+    if columns is None:
+        columns = detect_columns(df.columns)
+    lat_col = columns['lat']
+    lon_col = columns['lon']
+    cost_col = columns['custo']
+    name_col = columns['nome']
 
     if lat_col is None or lon_col is None:
         raise ValueError(f"Não encontrei colunas de latitude e longitude {list(df.columns)}")
     
-    out = pd.DataFrame()
-    out['lat'] = pd.to_numeric(df[lat_col], errors='coerce')
-    out['lon'] = pd.to_numeric(df[lon_col], errors='coerce')
-    out['custo'] = pd.to_numeric(df[cost_col], errors='coerce') if cost_col is not None else np.nan
-    out['nome'] = df[name_col].astype(str) if name_col is not None else [f"Ponto {i}" for i in range(len(df))]
+    # converte so as colunas usadas, direto para arrays float32 (metade da memoria do float64)
+    lat = pd.to_numeric(df[lat_col], errors='coerce').to_numpy(dtype=np.float32)
+    lon = pd.to_numeric(df[lon_col], errors='coerce').to_numpy(dtype=np.float32)
+    validos = ~(np.isnan(lat) | np.isnan(lon))
+    linhas = np.flatnonzero(validos)
 
-    out = out.dropna(subset=['lat','lon']).reset_index(drop=True)
+    if cost_col is not None:
+        custo = pd.to_numeric(df[cost_col], errors='coerce').to_numpy(dtype=np.float32)[validos]
+    else:
+        custo = np.full(len(linhas), np.nan, dtype=np.float32)
 
-    if out['custo'].notna().any():
-        med = float(out['custo'].median())
+    if np.isfinite(custo).any():
+        med = float(np.nanmedian(custo))
         if not np.isfinite(med):
             med = 1.0
-        out['custo'] = out['custo'].fillna(med)
+        custo[np.isnan(custo)] = med
+    else:
+        custo = np.ones(len(linhas), dtype=np.float32)
+
+    # o nome e texto: so converte as linhas que sobraram, como Series de strings
+    # (um array numpy '<U' teria a largura do maior nome em todas as linhas)
+    if name_col is not None:
+        nome = df[name_col].iloc[linhas].astype(str).reset_index(drop=True)
     else:
-        out['custo'] = 1.0
-    return out
+        nome = [f"Ponto {i}" for i in linhas]
+
+    return pd.DataFrame({
+        'lat': lat[validos],
+        'lon': lon[validos],
+        'custo': custo,
+        'nome': nome
+    })
 
 def city_center(df: pd.DataFrame) -> dict:
     """
@@ -68,49 +132,56 @@ def city_center(df: pd.DataFrame) -> dict:
     - deve retornar um dicionario (-> dict)
     """
     return dict(
-        
-        lat = float(df['lat'].mean()), 
-        lon = float(df['lon'].mean())
+        # acumula em float64 mesmo com as colunas em float32
+        lat = float(np.mean(df['lat'].to_numpy(), dtype=np.float64)), 
+        lon = float(np.mean(df['lon'].to_numpy(), dtype=np.float64))
     )
 
 #------------ Traces ------------------------------
 
 
 def make_point_trace(df:pd.DataFrame,name:str)->go.Scattermapbox:
-    hover = ("<b>%{customdata[0]}</b><br>"
-             "Custo: %{customdata[1]}<br>"
+    # o nome vai em 'text' e o custo (numerico) em 'customdata': nada de
+    # juntar texto e numero em um array de objetos do tamanho do DataFrame
+    hover = ("<b>%{text}</b><br>"
+             "Custo: %{customdata}<br>"
              "Lat: %{lat:.5f}<br>Lon: %{lon:.5f}")
     
-    c = df["custo"].astype(float).values
+    c = df["custo"].to_numpy(dtype=np.float32)
     c_min, c_max = float(np.min(c)), float(np.max(c))
 
     if not np.isfinite(c_min) or not np.isfinite(c_max) or abs(c_max - c_min) < 1e-9:
-        size = np.full_like(c, 10.0, dtype=float)
+        sizes = np.full(len(c), 10.0, dtype=np.float32)
     else:
-        size = (c - c_min) / (c_max - c_min) * 20 + 6
-    sizes = np.clip(size, 6, 26)
+        # calcula o tamanho no proprio array (sem criar arrays intermediarios)
+        sizes = c - np.float32(c_min)
+        sizes *= np.float32(20 / (c_max - c_min))
+        sizes += np.float32(6)
+        np.clip(sizes, 6, 26, out=sizes)
 
-    custom = np.stack([df['nome'].values, df['custo'].values], axis=1)
+    lat = df['lat'].to_numpy(dtype=np.float32)
+    lon = df['lon'].to_numpy(dtype=np.float32)
     return go.Scattermapbox(
-        lat = df['lat'],
-        lon = df['lon'],
+        lat = lat,
+        lon = lon,
         mode = 'markers',
         marker = dict(
             size = sizes,
-            color = df['custo'], 
+            color = c, 
             colorscale = "Viridis",
             colorbar = dict(title='Custo')
         ),
         name = f"{name} • Pontos",
         hovertemplate = hover, 
-        customdata = custom     
+        text = df['nome'].to_numpy(),
+        customdata = c
     )
 
 def make_density_trace(df: pd.DataFrame, name: str) -> go.Densitymapbox:
     return go.Densitymapbox(
-        lat = df['lat'],
-        lon = df['lon'],
-        z = df['custo'],
+        lat = df['lat'].to_numpy(dtype=np.float32),
+        lon = df['lon'].to_numpy(dtype=np.float32),
+        z = df['custo'].to_numpy(dtype=np.float32),
         radius = 20,
         colorscale = "Inferno",
         name = f"{name} • Pontos",
@@ -118,66 +189,310 @@ def make_density_trace(df: pd.DataFrame, name: str) -> go.Densitymapbox:
         colorbar = dict(title='Custo')
     )
 
+#------------ Agregacao em grade ----------------------
+
+# niveis de agregacao: (rotulo, tamanho da celula em graus de latitude, zoom do mapa)
+GRID_LEVELS = [
+    ("Grade grossa", 0.02, 9),
+    ("Grade media", 0.005, 11),
+    ("Grade fina", 0.00125, 13),
+]
+# camada opcional (--pontos) de pontos crus, um marcador por linha, para o zoom
+# mais proximo; cidades maiores que isso entram com uma amostra espalhada pelo arquivo
+RAW_POINTS_MAX = 20000
+RAW_POINTS_ZOOM = 15
+
+
+def aggregate_grid(df: pd.DataFrame, cell_deg: float) -> pd.DataFrame:
+    """
+    Agrupa os pontos em celulas de uma grade regular
+    - a celula tem cell_deg graus de latitude; na longitude o tamanho e corrigido
+      pelo cosseno da latitude media, para a celula ficar quase quadrada no mapa
+    - cada celula vira uma linha: centroide (lat/lon), custo medio, mediano e contagem
+    """
+    lat = df['lat'].to_numpy(dtype=np.float64)
+    lon = df['lon'].to_numpy(dtype=np.float64)
+    cell_lon = cell_deg / max(np.cos(np.radians(np.mean(lat))), 0.1)
+
+    cells = pd.DataFrame({
+        'iy': np.floor(lat / cell_deg).astype(np.int64),
+        'ix': np.floor(lon / cell_lon).astype(np.int64),
+        'lat': lat,
+        'lon': lon,
+        'custo': df['custo'].to_numpy()
+    }).groupby(['iy', 'ix'], sort=False).agg(
+        lat = ('lat', 'mean'),
+        lon = ('lon', 'mean'),
+        custo_medio = ('custo', 'mean'),
+        custo_mediano = ('custo', 'median'),
+        contagem = ('custo', 'size')
+    )
+    return pd.DataFrame({
+        'lat': cells['lat'].to_numpy(dtype=np.float32),
+        'lon': cells['lon'].to_numpy(dtype=np.float32),
+        'custo_medio': cells['custo_medio'].to_numpy(dtype=np.float32),
+        'custo_mediano': cells['custo_mediano'].to_numpy(dtype=np.float32),
+        'contagem': cells['contagem'].to_numpy(dtype=np.int32)
+    })
+
+
+def make_cell_trace(cells: pd.DataFrame, name: str, level: str) -> go.Scattermapbox:
+    """
+    Um marcador por celula: cor pelo custo medio, tamanho pela quantidade de pontos
+    """
+    hover = ("<b>%{customdata[2]:,} pontos</b><br>"
+             "Custo medio: %{customdata[0]:.2f}<br>"
+             "Custo mediano: %{customdata[1]:.2f}<br>"
+             "Lat: %{lat:.5f}<br>Lon: %{lon:.5f}")
+
+    n = cells['contagem'].to_numpy(dtype=np.float32)
+    n_max = float(n.max()) if len(n) else 1.0
+    sizes = np.float32(6) + np.float32(20) * np.log1p(n) / np.float32(np.log1p(n_max) or 1.0)
+
+    return go.Scattermapbox(
+        lat = cells['lat'],
+        lon = cells['lon'],
+        mode = 'markers',
+        marker = dict(
+            size = sizes,
+            color = cells['custo_medio'],
+            colorscale = "Viridis",
+            colorbar = dict(title='Custo medio')
+        ),
+        name = f"{name} • {level}",
+        hovertemplate = hover,
+        customdata = np.column_stack([
+            cells['custo_medio'].to_numpy(dtype=np.float32),
+            cells['custo_mediano'].to_numpy(dtype=np.float32),
+            cells['contagem'].to_numpy(dtype=np.float32)
+        ])
+    )
+
+
+def make_cell_density_trace(cells: pd.DataFrame, name: str) -> go.Densitymapbox:
+    """
+    Mapa de calor a partir das celulas: o peso de cada celula e a soma dos custos
+    dos seus pontos (custo medio x contagem), o mesmo total do calor ponto a ponto
+    """
+    total = cells.assign(custo = cells['custo_medio'] * cells['contagem'])
+    trace = make_density_trace(total, name)
+    trace.name = f"{name} • Calor"
+    return trace
+
+#------------ Cache dos dados padronizados ------------------
+
+# versão do formato gravado no cache; mude quando standardize_columns mudar
+CACHE_VERSION = 3
+# colunas numericas gravadas como um .npy cada; o nome vai separado (save_names)
+CACHE_COLUMNS = ("lat", "lon", "custo")
+
+
+def file_hash(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def cache_folder(path: str) -> str:
+    path = os.path.abspath(path)
+    key = hashlib.sha1(path.encode("utf-8")).hexdigest()[:12]
+    stem = os.path.splitext(os.path.basename(path))[0]
+    return os.path.join(os.path.dirname(path), ".cache_mapas", f"{stem}-{key}")
+
+
+def save_names(folder: str, names) -> None:
+    """
+    Grava os nomes como categorias: um codigo int32 por linha (nome_codigos.npy)
+    e os nomes distintos uma unica vez, em UTF-8 concatenado (nome_texto.npy)
+    com as posicoes de inicio/fim (nome_offsets.npy). Um nome longo so ocupa
+    o proprio tamanho, em vez de definir a largura de todas as linhas
+    """
+    codes, uniques = pd.factorize(pd.Series(names, dtype=object))
+    encoded = [str(u).encode("utf-8") for u in uniques]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(e) for e in encoded], out=offsets[1:])
+    np.save(os.path.join(folder, "nome_codigos.npy"), codes.astype(np.int32))
+    np.save(os.path.join(folder, "nome_texto.npy"), np.frombuffer(b"".join(encoded), dtype=np.uint8))
+    np.save(os.path.join(folder, "nome_offsets.npy"), offsets)
+
+
+def load_names(folder: str) -> pd.Categorical:
+    """
+    Le os nomes gravados por save_names: so os nomes distintos viram texto,
+    as linhas ficam como codigos da categoria
+    """
+    codes = np.load(os.path.join(folder, "nome_codigos.npy"), mmap_mode="r")
+    blob = np.load(os.path.join(folder, "nome_texto.npy")).tobytes()
+    offsets = np.load(os.path.join(folder, "nome_offsets.npy"))
+    categories = [blob[a:b].decode("utf-8") for a, b in zip(offsets[:-1], offsets[1:])]
+    return pd.Categorical.from_codes(codes, categories=categories)
+
+
+def load_standardized(path: str, use_cache: bool = True) -> pd.DataFrame:
+    """
+    Devolve standardize_columns(pd.read_csv(path)), guardando o resultado em
+    arrays .npy ao lado do CSV. Nas execuções seguintes lat, lon e custo são
+    abertos com memory-map (o DataFrame usa os próprios arrays, sem cópia) e o
+    nome volta como categoria, sem reler nem reconverter o CSV.
+    - tamanho e mtime iguais: usa o cache direto
+    - mtime diferente: compara o hash do conteúdo (um 'touch' não invalida o cache)
+    """
+    if not use_cache:
+        return standardize_columns(*read_city_csv(path))
+
+    folder = cache_folder(path)
+    meta_path = os.path.join(folder, "meta.json")
+    stat = os.stat(path)
+    meta = None
+    try:
+        with open(meta_path, encoding="utf-8") as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        pass
+
+    valid = meta is not None and meta.get("versao") == CACHE_VERSION and meta.get("tamanho") == stat.st_size
+    if valid and meta.get("mtime_ns") != stat.st_mtime_ns:
+        valid = meta.get("sha256") == file_hash(path)
+        if valid:
+            meta["mtime_ns"] = stat.st_mtime_ns
+            with open(meta_path, "w", encoding="utf-8") as f:
+                json.dump(meta, f)
+
+    if valid:
+        try:
+            columns = {
+                col: np.load(os.path.join(folder, f"{col}.npy"), mmap_mode="r")
+                for col in CACHE_COLUMNS
+            }
+            columns["nome"] = load_names(folder)
+            return pd.DataFrame(columns, copy=False)
+        except (OSError, ValueError, UnicodeDecodeError):
+            pass  # cache incompleto: refaz abaixo
+
+    df = standardize_columns(*read_city_csv(path))
+    try:
+        os.makedirs(folder, exist_ok=True)
+        # apaga o meta.json antigo antes de sobrescrever os arrays: se a gravação
+        # parar no meio, o cache fica sem meta e é refeito na próxima execução
+        if os.path.exists(meta_path):
+            os.remove(meta_path)
+        for col in CACHE_COLUMNS:
+            np.save(os.path.join(folder, f"{col}.npy"), df[col].to_numpy())
+        save_names(folder, df["nome"].to_numpy())
+        # meta.json por último: só vale quando todos os arrays já estão gravados
+        with open(meta_path, "w", encoding="utf-8") as f:
+            json.dump({
+                "versao": CACHE_VERSION,
+                "tamanho": stat.st_size,
+                "mtime_ns": stat.st_mtime_ns,
+                "sha256": file_hash(path)
+            }, f)
+    except OSError:
+        pass  # pasta sem permissão de escrita: segue sem cache
+    return df
+
 #---------------------- MAIN ------------------------------
 
+FOLDER = "C:/Users/noturno/Desktop/python2 luis/sistema/"
+# cidades usadas quando nenhuma pasta/manifesto e informado: (arquivo, nome, zoom)
+DEFAULT_CITIES = [
+    ("ny.csv", "Nova York", 9),
+    ("rj.csv", "Rio de Janeiro", 10),
+]
 
-def main():
-    #carregar e padronizar os dados!
-    folder = "C:/Users/noturno/Desktop/python2 luis/sistema/"
-    ny = standardize_columns(pd.read_csv(f"{folder}ny.csv"))
-    rj = standardize_columns(pd.read_csv(f"{folder}rj.csv"))
 
-    #cria os quatro traces(ny pontos / ny calor / rio pontos / rio calor)
-    ny_point = make_point_trace(ny, "Nova York")
-    ny_heat = make_density_trace(ny, "Nova York")
-    rj_point = make_point_trace(rj, "Rio de Janeiro")
-    rj_heat =  make_density_trace(rj, "Rio de Janeiro")
+def list_cities(source: str) -> list:
+    """
+    Monta a lista de cidades (caminho, nome, zoom) a partir de:
+    - uma pasta: cada .csv vira uma cidade com o nome do arquivo
+    - um manifesto .csv com as colunas arquivo, nome e zoom (zoom opcional);
+      caminhos relativos sao relativos a pasta do manifesto
+    """
+    if os.path.isdir(source):
+        return [
+            (os.path.join(source, f), os.path.splitext(f)[0], 10)
+            for f in sorted(os.listdir(source)) if f.lower().endswith(".csv")
+        ]
+    manifest = pd.read_csv(source)
+    base = os.path.dirname(os.path.abspath(source))
+    return [
+        (
+            os.path.join(base, row["arquivo"]),
+            str(row["nome"]),
+            int(row["zoom"]) if "zoom" in manifest.columns and pd.notna(row["zoom"]) else 10
+        )
+        for _, row in manifest.iterrows()
+    ]
 
-    fig = go.Figure([ny_point, ny_heat, rj_point, rj_heat])
 
-    def center_zoom(df, zoom):
+def city_layers(df: pd.DataFrame, name: str, zoom: int, raw_points: bool = False) -> dict:
+    """
+    Traces de uma cidade (um por nivel da grade + mapa de calor) e as opcoes
+    do dropdown: (rotulo, indice do trace dentro da cidade, centro/zoom)
+    raw_points: acrescenta a camada de pontos crus (desligada por padrao)
+    """
+    def center_zoom(zoom):
         return dict(center=city_center(df), zoom=zoom)
-    
-    # dropdown simples com quatro opções (cidade x visualização)
+
+    # em vez de um marcador por ponto, cada cidade embute so as celulas da grade
+    # (um trace por nivel de agregacao) e um mapa de calor feito da grade mais fina:
+    # o tamanho do HTML passa a depender do numero de celulas, nao de pontos
+    traces = []
+    views = []
+    for level, cell_deg, level_zoom in GRID_LEVELS:
+        cells = aggregate_grid(df, cell_deg)
+        views.append((f"{name} • {level}", len(traces), center_zoom(level_zoom)))
+        traces.append(make_cell_trace(cells, name, level))
+    # o calor usa as celulas do ultimo nivel (a grade mais fina)
+    views.append((f"{name} • Calor", len(traces), center_zoom(zoom)))
+    traces.append(make_cell_density_trace(cells, name))
+    if raw_points:
+        # no zoom mais proximo, os proprios pontos (limitados a RAW_POINTS_MAX)
+        points = df
+        label = f"{name} • Pontos"
+        if len(df) > RAW_POINTS_MAX:
+            points = df.iloc[np.linspace(0, len(df) - 1, RAW_POINTS_MAX).astype(np.int64)]
+            label = f"{name} • Pontos (amostra)"
+        views.append((label, len(traces), center_zoom(RAW_POINTS_ZOOM)))
+        traces.append(make_point_trace(points, name))
+    # em dicionarios para poder voltar do processo que gerou a cidade
+    return dict(name=name, traces=[t.to_plotly_json() for t in traces], views=views)
+
+
+def build_figure(cities: list) -> go.Figure:
+    """
+    Junta os traces das cidades em uma figura e gera o dropdown a partir delas
+    """
+    traces = []
+    views = []
+    for city in cities:
+        offset = len(traces)
+        traces.extend(city["traces"])
+        views.extend((label, offset + i, view) for label, i, view in city["views"])
+
+    fig = go.Figure(traces)
+    for i, trace in enumerate(fig.data):
+        trace.visible = i == views[0][1]
+
+    # dropdown com uma opção por cidade x visualização
     buttons = [
         dict(
-            label = "Nova York • Pontos", 
-            method = "update", 
-            args = [
-                {"visible":[True, False, False, False]},
-                {"mapbox": center_zoom(ny, 9)}
-            ]
-        ),
-        dict(
-            label = "Nova York • Calor", 
-            method = "update", 
-            args = [
-                {"visible":[False, True, False, False]},
-                {"mapbox": center_zoom(ny, 9)}
-            ]
-        ),
-        dict(
-            label = "Rio de Janeiro • Pontos", 
-            method = "update", 
-            args = [
-                {"visible":[False, False, True, False]},
-                {"mapbox": center_zoom(rj, 10)}
-            ]
-        ),
-        dict(
-            label = "Rio de Janeiro • Calor", 
-            method = "update", 
+            label = label,
+            method = "update",
             args = [
-                {"visible":[False, False, False, True]},
-                {"mapbox": center_zoom(rj, 10)}
+                {"visible": [i == index for i in range(len(traces))]},
+                {"mapbox": view}
             ]
         )
+        for label, index, view in views
     ]
 
     fig.update_layout(
         title = "Mapa Interativo de Custos - Pontos e Mapa de Calor",
         mapbox_style = "open-street-map",
-        mapbox = dict(center=city_center(rj), zoom=10),
+        mapbox = views[0][2],
         margin = dict(l=10, r=10, t=50, b=10),
         updatemenus = [dict(
             buttons = buttons,
@@ -197,15 +512,81 @@ def main():
             x = 0.99
         )
     )
+    return fig
+
+
+def write_plotlyjs(out_folder: str) -> None:
+    """
+    Grava (uma vez por execução) o plotly.min.js compartilhado pelos mapas da pasta
+    """
+    from plotly.offline import get_plotlyjs
+    with open(os.path.join(out_folder, "plotly.min.js"), "w", encoding="utf-8") as f:
+        f.write(get_plotlyjs())
+
 
+def write_figure(fig: go.Figure, path: str, plotlyjs: str = "cdn") -> None:
     #salva HTML de apresentação
+    # plotlyjs 'local': o HTML aponta para o plotly.min.js da mesma pasta (funciona offline)
     fig.write_html(
-        f"{folder}mapa_custos_interativo.html",
-        include_plotlyjs = "cdn",
+        path,
+        include_plotlyjs = "directory" if plotlyjs == "local" else "cdn",
         full_html = True
         )
-    print(f"Arquivo gerado com sucesso em: {folder}mapa_custos_interativo.html")
+    print(f"Arquivo gerado com sucesso em: {path}")
+
+
+def city_filename(name: str) -> str:
+    slug = re.sub(r"[^0-9a-z]+", "_", unicodedata.normalize("NFKD", name).encode("ascii", "ignore").decode().lower())
+    return f"mapa_{slug.strip('_')}.html"
+
+
+def process_city(job: tuple) -> dict:
+    """
+    Trabalho de um processo do pool: carrega, padroniza, monta os traces
+    e grava o HTML so da cidade
+    """
+    path, name, zoom, out_folder, use_cache, plotlyjs, raw_points = job
+    city = city_layers(load_standardized(path, use_cache), name, zoom, raw_points)
+    write_figure(build_figure([city]), os.path.join(out_folder, city_filename(name)), plotlyjs)
+    return city
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Gera os mapas de custos por cidade")
+    parser.add_argument("fonte", nargs="?", help="pasta com os CSV das cidades ou manifesto (arquivo,nome,zoom)")
+    parser.add_argument("--saida", help="pasta dos HTML gerados (padrão: a pasta dos dados)")
+    parser.add_argument("--processos", type=int, default=None, help="processos em paralelo (padrão: nº de CPUs)")
+    parser.add_argument("--sem-cache", action="store_true", help="ignora o cache .npy e relê os CSV")
+    parser.add_argument("--pontos", action="store_true",
+                        help=f"inclui uma camada com os pontos crus (até {RAW_POINTS_MAX} por cidade); aumenta o HTML")
+    parser.add_argument("--plotlyjs", choices=["cdn", "local"], default=config.PLOTLY_JS,
+                        help="'local' grava um plotly.min.js na pasta e todos os mapas usam essa cópia")
+    args = parser.parse_args(argv)
+
+    #carregar e padronizar os dados!
+    if args.fonte:
+        cities = list_cities(args.fonte)
+        out_folder = args.saida or (args.fonte if os.path.isdir(args.fonte) else os.path.dirname(os.path.abspath(args.fonte)))
+    else:
+        cities = [(os.path.join(FOLDER, f), name, zoom) for f, name, zoom in DEFAULT_CITIES]
+        out_folder = args.saida or FOLDER
+    if not cities:
+        raise SystemExit("Nenhuma cidade encontrada")
+    os.makedirs(out_folder, exist_ok=True)
+
+    # cada cidade e lida e agregada em um processo separado; a ordem do resultado
+    # segue a da lista, entao o dropdown fica na mesma ordem das cidades
+    if args.plotlyjs == "local":
+        write_plotlyjs(out_folder)
+    jobs = [
+        (path, name, zoom, out_folder, not args.sem_cache, args.plotlyjs, args.pontos)
+        for path, name, zoom in cities
+    ]
+    with ProcessPoolExecutor(max_workers=args.processos) as pool:
+        layers = list(pool.map(process_city, jobs))
+
+    write_figure(build_figure(layers), os.path.join(out_folder, "mapa_custos_interativo.html"), args.plotlyjs)
 
 # Inicia o servidor
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    main()
@@ -1,24 +1,69 @@
-from flask import Flask, request, jsonify, render_template_string
-import pandas as pd
-import sqlite3
+from flask import Flask, request, jsonify, render_template_string, make_response, url_for
 import os
-import plotly.graph_objs as go
-from dash import Dash, html, dcc
-import dash
-import numpy as np
+import gzip
+import json
+import shutil
+import tempfile
+from urllib.parse import urlencode
 import config
-from sklearn.cluster import KMeans
-from sklearn.preprocessing import StandardScaler
+from banco import conexao, criar_versao, versao_dados, incrementar_versao, criar_resumo, atualizar_resumo, RESUMOS, COLUNAS_RESUMO
+from cache import CacheLRU
+from tarefas import FilaTarefas
+import metricas
+from metricas import medir
+# pandas, numpy, plotly e sklearn sao importados dentro das rotas que usam:
+# assim o app sobe rapido e as rotas '/' e '/upload' nao pagam pelo plotly/sklearn
+# (rode benchmark_inicializacao.py para ver o custo de cada import)
 #pip install scikit-learn
 #Para lista todas as libs instaladas no python use pip list 
 
 app = Flask(__name__)
 caminhoBd = config.DB_PATH
 rotas = config.ROTAS
+# html dos graficos e da correlacao ja renderizado, por versao dos dados
+cache_graficos = CacheLRU(config.CACHE_GRAFICOS_TAMANHO)
+# modelos KMeans do /grafico3d ja ajustados, por versao dos dados
+cache_modelos = CacheLRU(config.CACHE_MODELOS_TAMANHO)
+# ingestoes do /upload em segundo plano (rota 11 mostra o progresso)
+fila_upload = FilaTarefas(config.UPLOAD_TRABALHADORES, config.UPLOAD_HISTORICO)
+# tempo de cada rota (rota 12 mostra os histogramas)
+if config.METRICAS_ATIVAS:
+    metricas.registrar(app)
 
 def init_db():
-    with sqlite3.connect(caminhoBd) as conn:
+    """
+    Cria as tabelas e migra bancos antigos. Roda uma vez, na subida do app:
+    as rotas contam com as tabelas ja criadas
+    """
+    with conexao(caminhoBd) as conn:
         cursor = conn.cursor()
+        # BEGIN IMMEDIATE pega a trava de escrita antes de olhar o esquema: com
+        # varios workers subindo juntos, so um cria/migra e os outros esperam
+        # e encontram tudo pronto (criacao, migracao e preenchimento sao atomicos)
+        cursor.execute('BEGIN IMMEDIATE')
+        # bancos antigos foram gravados com to_sql(if_exists='replace'), que troca
+        # a tabela por uma com as linhas diarias e sem a chave primaria em 'mes'.
+        # A tabela diaria e mantida como {tabela}_diario_legado (nada e apagado)
+        migracoes = {
+            # MAX(data) faz o sqlite devolver o ultimo valor de cada mes
+            'inadimplencia': '''
+                INSERT INTO inadimplencia (mes, inadimplencia)
+                SELECT mes, inadimplencia FROM (
+                    SELECT mes, inadimplencia, MAX(data) FROM inadimplencia_diario_legado GROUP BY mes
+                )
+            ''',
+            'selic': '''
+                INSERT INTO selic (mes, selic_diaria)
+                SELECT mes, AVG(selic_diaria) FROM selic_diario_legado GROUP BY mes
+            '''
+        }
+        antigas = []
+        for tabela in migracoes:
+            colunas = [c[1] for c in cursor.execute(f'PRAGMA table_info({tabela})')]
+            if 'data' in colunas:
+                cursor.execute(f'ALTER TABLE {tabela} RENAME TO {tabela}_diario_legado')
+                antigas.append(tabela)
+
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS inadimplencia (
                 mes TEXT PRIMARY KEY,
@@ -31,6 +76,22 @@ def init_db():
                 selic_diaria REAL
             )
         ''')
+        criar_resumo(cursor, 'inadimplencia', 'inadimplencia')
+        criar_resumo(cursor, 'selic', 'selic_diaria')
+        criar_versao(cursor)
+
+        for tabela in antigas:
+            cursor.execute(migracoes[tabela])
+            # as linhas diarias antigas ainda permitem montar o resumo completo
+            coluna = 'selic_diaria' if tabela == 'selic' else tabela
+            cursor.execute(f'''
+                INSERT OR REPLACE INTO {RESUMOS[tabela][0]} (mes, media, minimo, maximo, contagem, ultimo)
+                SELECT mes, AVG({coluna}), MIN({coluna}), MAX({coluna}), COUNT({coluna}), (
+                    SELECT d.{coluna} FROM {tabela}_diario_legado AS d
+                    WHERE d.mes = a.mes ORDER BY d.data DESC LIMIT 1
+                )
+                FROM {tabela}_diario_legado AS a GROUP BY mes
+            ''')
         conn.commit()
 vazio = 0
 
@@ -53,8 +114,64 @@ def index():
         <a href="{rotas[5]}">Analisar Correlação </a><br>
         <a href="{rotas[6]}">Observabilidade em 3D</a><br>
         <a href="{rotas[7]}">Editar Selic</a><br>
+        <a href="{rotas[12]}">Editar em Lote</a><br>
+        <a href="{rotas[8]}?serie=selic">Series em JSON</a><br>
     ''')
 
+def ingerir(inad_arquivo, selic_arquivo, progresso=None):
+    """
+    Le, agrega e grava os dois CSVs (arquivo enviado ou caminho no disco).
+    Com 'progresso' (tarefas.Progresso) publica as linhas lidas e os meses gravados
+    """
+    from ingestao import ler_em_blocos, AgregadorMensal, salvar_mensal, salvar_resumo
+    # le os arquivos em blocos: a memoria fica limitada ao tamanho do bloco
+    # e o agregador mensal acumula as medias sem guardar as linhas diarias
+    inad_agregador = AgregadorMensal('inadimplencia')
+    selic_agregador = AgregadorMensal('selic_diaria')
+    for arquivo, agregador in ((inad_arquivo, inad_agregador), (selic_arquivo, selic_agregador)):
+        if progresso:
+            progresso.atualizar(etapa=f'lendo {agregador.coluna_valor}')
+        with medir('upload.leitura_csv'):
+            for bloco in ler_em_blocos(arquivo, agregador.coluna_valor, config.UPLOAD_LINHAS_POR_BLOCO):
+                agregador.adicionar(bloco)
+                if progresso:
+                    progresso.somar(linhas_lidas=len(bloco))
+
+    with medir('upload.agregacao'):
+        inad_mensal = inad_agregador.mensal()
+        selic_mensal = selic_agregador.mensal()
+    if progresso:
+        progresso.atualizar(etapa='gravando', meses_lidos=len(inad_mensal) + len(selic_mensal))
+
+    # grava so os meses novos ou alterados, tudo em uma unica transacao
+    with medir('upload.gravacao'), conexao(caminhoBd) as conn:
+        inad_alterados = salvar_mensal(
+            conn, 'inadimplencia', 'inadimplencia',
+            inad_mensal['mes'], inad_mensal['ultimo']
+        )
+        selic_alterados = salvar_mensal(
+            conn, 'selic', 'selic_diaria',
+            selic_mensal['mes'], selic_mensal['media']
+        )
+        # o resumo mensal e mantido na mesma transacao da base
+        resumos_alterados = salvar_resumo(conn, 'inadimplencia', inad_mensal)
+        resumos_alterados += salvar_resumo(conn, 'selic', selic_mensal)
+        if inad_alterados or selic_alterados or resumos_alterados:
+            incrementar_versao(conn)
+    if progresso:
+        progresso.atualizar(etapa='gravado', meses_gravados=inad_alterados + selic_alterados)
+    return {
+        "Mensagem":"Dados cadastrados com sucesso!",
+        "Meses alterados":{"inadimplencia":inad_alterados, "selic":selic_alterados}
+    }
+
+def ingerir_da_pasta(pasta, inad_caminho, selic_caminho, progresso=None):
+    # tarefa em segundo plano: os arquivos ja foram gravados em 'pasta' pela rota
+    try:
+        return ingerir(inad_caminho, selic_caminho, progresso)
+    finally:
+        shutil.rmtree(pasta, ignore_errors=True)
+
 @app.route(rotas[1], methods=['POST','GET'])
 def upload():
     inad_file = request.files.get('campo_inadimplencia')
@@ -62,60 +179,87 @@ def upload():
 
     if not inad_file or not selic_file:
         return jsonify({"Erro":"Ambos os arquivos devem ser enviados!"})
-    
-    inad_df = pd.read_csv(
-        inad_file,
-        sep = ';',
-        names = ['data','inadimplencia'],
-        header = 0
-    )
-    selic_df = pd.read_csv(
-        selic_file,
-        sep = ';',
-        names = ['data','selic_diaria'],
-        header = 0
-    )
 
-    inad_df['data'] = pd.to_datetime(
-        inad_df['data'], 
-        format = "%d/%m/%Y"
-    )
-    selic_df['data'] = pd.to_datetime(
-          selic_df['data'], 
-          format="%d/%m/%Y"
-        )
-    
-    inad_df['mes'] = inad_df['data'].dt.to_period('M').astype(str)
-    selic_df['mes'] = selic_df['data'].dt.to_period('M').astype(str)
-
-    inad_mensal = inad_df[["mes","inadimplencia"]].drop_duplicates()
-    selic_mensal = selic_df.groupby('mes')['selic_diaria'].mean().reset_index()
-
-    with sqlite3.connect(caminhoBd) as conn:
-        inad_df.to_sql(
-            'inadimplencia',
-            conn,
-            if_exists = 'replace',
-            index = False
-        )
-        selic_df.to_sql(
-            'selic',
-            conn,
-            if_exists = 'replace',
-            index = False
-        )
-    return jsonify({"Mensagem":"Dados cadastrados com sucesso!"})
+    assincrono = request.values.get('assincrono', str(int(config.UPLOAD_ASSINCRONO)))
+    if assincrono.lower() not in ('1', 'true', 'sim'):
+        return jsonify(ingerir(inad_file, selic_file))
+
+    # modo assincrono: so grava os arquivos e enfileira a ingestao
+    pasta = tempfile.mkdtemp(prefix='upload_', dir=config.UPLOAD_PASTA)
+    inad_caminho = os.path.join(pasta, 'inadimplencia.csv')
+    selic_caminho = os.path.join(pasta, 'selic.csv')
+    inad_file.save(inad_caminho)
+    selic_file.save(selic_caminho)
+    tarefa_id = fila_upload.enviar(ingerir_da_pasta, pasta, inad_caminho, selic_caminho)
+    return jsonify({
+        "Mensagem":"Arquivos recebidos, ingestao em andamento",
+        "Tarefa":tarefa_id,
+        "Status":url_for('status_upload', tarefa_id=tarefa_id)
+    }), 202
+
+@app.route(rotas[10])
+def status_upload(tarefa_id):
+    # ex: {"estado": "executando", "etapa": "lendo selic_diaria", "linhas_lidas": 150000, ...}
+    status = fila_upload.status(tarefa_id)
+    if status is None:
+        return jsonify({"Erro":"Tarefa nao encontrada"}),404
+    return jsonify(status)
 
 @app.route(rotas[2], methods=['GET','POST'])
 def consultar():
 #alquimistas digitais
-    if request.method == "POST":
-        tabela = request.form.get("campo_tabela")
+    tabela = request.values.get("campo_tabela")
+    if tabela:
         if tabela not in ["inadimplencia","selic"]:
             return jsonify({"Erro":"Tabela Invalida"}),400
-        with sqlite3.connect(caminhoBd) as conn:
-            df = pd.read_sql_query(f"SELECT * FROM {tabela}",conn)
-        return df.to_html(index=False)
+        try:
+            tamanho = int(request.values.get("tamanho", config.CONSULTA_TAMANHO_PAGINA))
+        except ValueError:
+            return jsonify({"Erro":"Tamanho de pagina invalido"}),400
+        tamanho = max(1, min(tamanho, config.CONSULTA_TAMANHO_MAXIMO))
+        import pandas as pd
+
+        # paginacao por chave: a proxima pagina comeca depois do ultimo mes mostrado,
+        # entao o sqlite so percorre o indice da chave primaria a partir dali
+        filtros = {
+            "depois": "mes > ?",
+            "campo_inicio": "mes >= ?",
+            "campo_fim": "mes <= ?"
+        }
+        where = []
+        parametros = []
+        for campo, condicao in filtros.items():
+            valor = request.values.get(campo)
+            if valor:
+                where.append(condicao)
+                parametros.append(valor)
+        where = f"WHERE {' AND '.join(where)}" if where else ""
+
+        with medir('consultar.read_sql_query'), conexao(caminhoBd) as conn:
+            df = pd.read_sql_query(
+                f"SELECT * FROM {tabela} {where} ORDER BY mes LIMIT ?",
+                conn,
+                params = parametros + [tamanho + 1]
+            )
+
+        proxima = ""
+        if len(df) > tamanho:
+            df = df.iloc[:tamanho]
+            argumentos = {
+                "campo_tabela": tabela,
+                "campo_inicio": request.values.get("campo_inicio", ""),
+                "campo_fim": request.values.get("campo_fim", ""),
+                "tamanho": tamanho,
+                "depois": df["mes"].iloc[-1]
+            }
+            proxima = f'<a href="{rotas[2]}?{urlencode(argumentos)}"> Proxima pagina </a>'
+        with medir('consultar.to_html'):
+            tabela_html = df.to_html(index=False)
+        return render_template_string('''
+            {{ tabela|safe }}
+            <br>{{ proxima|safe }}
+            <br><a href="{{ voltar }}"> Voltar </a>
+        ''', tabela = tabela_html, proxima = proxima, voltar = rotas[2])
     
     return render_template_string(f'''
         <h1> Consulta de Tabelas </h1>
@@ -125,16 +269,77 @@ def consultar():
                 <option value="inadimplencia"> Inadimplencia </option>
                 <option value="selic"> Taxa Selic </option>
             </select>
+            <label for="campo_inicio"> De (AAAA-MM) </label>
+            <input type="text" name="campo_inicio" placeholder="2023-01">
+            <label for="campo_fim"> Ate (AAAA-MM) </label>
+            <input type="text" name="campo_fim" placeholder="2025-12">
             <input type="submit" value="Consultar">
         </form>
         <br><a href="{rotas[0]}"> Voltar </a>
     ''')
 
+def resposta_com_etag(etag, gerar, cache_control='no-cache', mimetype=None):
+    # o navegador ja tem esta versao: responde 304 sem chamar gerar()
+    if etag in request.if_none_match:
+        resposta = make_response('', 304)
+    else:
+        resposta = make_response(gerar())
+        if mimetype:
+            resposta.mimetype = mimetype
+    resposta.set_etag(etag)
+    resposta.headers['Cache-Control'] = cache_control
+    return resposta
+
+def filtro_meses(inicio=None, fim=None):
+    # WHERE da janela de meses (AAAA-MM) e os parametros do sqlite
+    filtros = []
+    parametros = []
+    if inicio:
+        filtros.append('mes >= ?')
+        parametros.append(inicio)
+    if fim:
+        filtros.append('mes <= ?')
+        parametros.append(fim)
+    return (f"WHERE {' AND '.join(filtros)}" if filtros else ''), parametros
+
+def ler_pontos():
+    # quantidade de pontos pedida (?pontos=N), limitada pelo config; None = erro
+    try:
+        pontos = int(request.args.get('pontos', config.GRAFICOS_PONTOS))
+    except ValueError:
+        return None
+    return max(3, min(pontos, config.GRAFICOS_PONTOS_MAXIMO))
+
 @app.route(rotas[3])
 def graficos():
-    with sqlite3.connect(caminhoBd) as conn:
-        inad_df = pd.read_sql_query('SELECT * FROM inadimplencia', conn)
-        selic_df = pd.read_sql_query('SELECT * FROM selic', conn)
+    # ex: /graficos?inicio=2015-01&fim=2018-12&pontos=2000 mostra so essa janela
+    inicio = request.args.get('inicio') or None
+    fim = request.args.get('fim') or None
+    pontos = ler_pontos()
+    if pontos is None:
+        return jsonify({"Erro":"Quantidade de pontos invalida"}),400
+    with conexao(caminhoBd) as conn:
+        versao = versao_dados(conn)
+
+    return resposta_com_etag(f'graficos-{versao}', lambda: cache_graficos.obter_ou_calcular(
+        ('graficos', versao, inicio, fim, pontos),
+        lambda: montar_graficos(inicio, fim, pontos)
+    ))
+
+def montar_graficos(inicio=None, fim=None, pontos=None):
+    import pandas as pd
+    import plotly.graph_objs as go
+    from reducao import lttb
+    where, parametros = filtro_meses(inicio, fim)
+    with medir('graficos.read_sql_query'), conexao(caminhoBd) as conn:
+        # le direto do resumo mensal: o custo nao depende das linhas diarias
+        inad_df = pd.read_sql_query(f'SELECT mes, ultimo AS inadimplencia FROM inadimplencia_mensal {where} ORDER BY mes', conn, params=parametros)
+        selic_df = pd.read_sql_query(f'SELECT mes, media AS selic_diaria FROM selic_mensal {where} ORDER BY mes', conn, params=parametros)
+
+    # series longas: manda para o navegador so os pontos que mantem o desenho (LTTB)
+    with medir('graficos.lttb'):
+        inad_df = inad_df.iloc[lttb(inad_df['inadimplencia'], pontos)]
+        selic_df = selic_df.iloc[lttb(selic_df['selic_diaria'], pontos)]
     
     ####### Aqui criei um grafico para inadimplencia
     fig1 = go.Figure()
@@ -168,14 +373,15 @@ def graficos():
         template = "plotly_dark"
     )
 
-    graph_html_1 = fig1.to_html(
-        full_html = False,
-        include_plotlyjs = "cdn"        
-        )
-    graph_html_2 = fig2.to_html(
-        full_html = False,
-        include_plotlyjs = False        
-        )
+    with medir('graficos.to_html'):
+        graph_html_1 = fig1.to_html(
+            full_html = False,
+            include_plotlyjs = plotlyjs()        
+            )
+        graph_html_2 = fig2.to_html(
+            full_html = False,
+            include_plotlyjs = False        
+            )
     return render_template_string('''
         <html>
             <head>
@@ -194,13 +400,23 @@ def graficos():
                 <h1>
                     <marquee> Graficos Economicos </marquee>
                 </h1>
+                <form method="GET">
+                    <label for="inicio"> De (AAAA-MM) </label>
+                    <input type="text" name="inicio" value="{{ inicio }}">
+                    <label for="fim"> Ate (AAAA-MM) </label>
+                    <input type="text" name="fim" value="{{ fim }}">
+                    <label for="pontos"> Pontos </label>
+                    <input type="text" name="pontos" value="{{ pontos }}">
+                    <input type="submit" value="Aproximar">
+                </form>
                 <div class="container">
                     <div class="graph">{{ reserva01|safe }}</div>
                     <div class="graph">{{ reserva02|safe }}</div>
                 </div>
             </body>
         </html>
-    ''', reserva01 = graph_html_1, reserva02 = graph_html_2)
+    ''', reserva01 = graph_html_1, reserva02 = graph_html_2,
+        inicio = inicio or '', fim = fim or '', pontos = pontos or '')
 
 @app.route(rotas[4], methods=['POST','GET'])
 def editar_inadimplencia():
@@ -211,13 +427,15 @@ def editar_inadimplencia():
             novo_valor = float(novo_valor)
         except:
             return jsonify({"Erro":"Valor Invalido"})
-        with sqlite3.connect(caminhoBd) as conn:
+        with conexao(caminhoBd) as conn:
             cursor = conn.cursor()
             cursor.execute('''
                 UPDATE inadimplencia 
                 SET inadimplencia = ? 
                 WHERE mes = ?
             ''', (novo_valor, mes))
+            atualizar_resumo(conn, 'inadimplencia', mes, novo_valor)
+            incrementar_versao(conn)
             conn.commit()
         return jsonify({"Mensagem":f"Valor atualozado para o mês {mes}"})
 
@@ -248,11 +466,13 @@ def editar_selic():
         except ValueError:
             return jsonify({"Erro":"Valor Invalido"})
         
-        with sqlite3.connect(caminhoBd) as conn:
+        with conexao(caminhoBd) as conn:
             cursor = conn.cursor()
             cursor.execute('''
                 UPDATE selic SET selic_diaria = ? WHERE mes = ?
             ''',(novo_valor, mes))
+            atualizar_resumo(conn, 'selic', mes, novo_valor)
+            incrementar_versao(conn)
             conn.commit()
         return jsonify({"Mensagem":f"Valor da selic para {mes} atualizado para {novo_valor}"})
 
@@ -272,22 +492,87 @@ def editar_selic():
         <a href="{rotas[0]}">Voltar</a>   
     ''')
 
+@app.route(rotas[12], methods=['POST','GET'])
+def editar_lote():
+    # varias correcoes de uma vez, nas duas tabelas, em uma unica transacao:
+    # JSON {"correcoes": [{"tabela": "selic", "mes": "2024-01", "valor": 0.04}, ...]}
+    # ou CSV 'tabela;mes;valor' (arquivo em campo_arquivo ou texto em campo_correcoes)
+    if request.method == "POST":
+        from correcoes import ler_correcoes_csv, ler_correcoes_json, aplicar_correcoes
+        tabela = request.values.get('campo_tabela') or None
+        arquivo = request.files.get('campo_arquivo')
+        try:
+            if request.is_json:
+                correcoes = ler_correcoes_json(request.get_json(), tabela)
+            elif arquivo:
+                correcoes = ler_correcoes_csv(arquivo.read().decode('utf-8'), tabela)
+            else:
+                correcoes = ler_correcoes_csv(request.values.get('campo_correcoes', ''), tabela)
+        except (ValueError, TypeError):
+            return jsonify({"Erro":"Correcoes em formato invalido"}), 400
+        if not correcoes:
+            return jsonify({"Erro":"Nenhuma correcao enviada"}), 400
+
+        with conexao(caminhoBd) as conn:
+            resultados = aplicar_correcoes(conn, correcoes)
+            alterados = sum(r['resultado'] == 'alterado' for r in resultados)
+            if alterados:
+                incrementar_versao(conn)
+        return jsonify({
+            "Mensagem":f"{alterados} mes(es) alterado(s)",
+            "Alterados":alterados,
+            "Resultados":resultados
+        })
+
+    return render_template_string(f'''
+        <h1> Editar em Lote </h1>
+        <form method="POST" action="{rotas[12]}" enctype="multipart/form-data">
+            <label for="campo_correcoes"> Correcoes (tabela;mes;valor, uma por linha) </label><br>
+            <textarea name="campo_correcoes" rows="10" cols="40">tabela;mes;valor
+selic;2023-01;0.0508
+inadimplencia;2023-01;3.4</textarea><br>
+
+            <label for="campo_arquivo"> ou um arquivo CSV </label>
+            <input name="campo_arquivo" type="file"><br>
+
+            <input type="submit" value="Aplicar Correcoes">
+        </form>
+        <br>
+        <a href="{rotas[0]}">Voltar</a>
+    ''')
+
 @app.route(rotas[5])
 def analisar_correlacao():
-    with sqlite3.connect(caminhoBd) as conn:
-        inad_df = pd.read_sql_query('SELECT * FROM inadimplencia', conn)
-        selic_df = pd.read_sql_query('SELECT * FROM selic', conn)
+    with conexao(caminhoBd) as conn:
+        versao = versao_dados(conn)
+
+    return resposta_com_etag(f'correlacao-{versao}', lambda: cache_graficos.obter_ou_calcular(
+        ('correlacao', versao), montar_correlacao
+    ))
+
+def montar_correlacao():
+    import numpy as np
+    import pandas as pd
+    import plotly.graph_objs as go
+    from correlacao import analisar
+    with medir('correlacao.read_sql_query'), conexao(caminhoBd) as conn:
+        # le direto do resumo mensal: o custo nao depende das linhas diarias
+        inad_df = pd.read_sql_query('SELECT mes, ultimo AS inadimplencia FROM inadimplencia_mensal ORDER BY mes', conn)
+        selic_df = pd.read_sql_query('SELECT mes, media AS selic_diaria FROM selic_mensal ORDER BY mes', conn)
     
         # realiza uma junção entre dois dataframes usando a coluna de mes como chave junção
-    merged = pd.merge(inad_df, selic_df, on='mes')
-    #calcula p coeficiente da correlação de person entre as duas variaveis(inadimplencia e selic)
-    correl = merged['inadimplencia'].corr(merged['selic_diaria'])
+    with medir('correlacao.merge'):
+        merged = pd.merge(inad_df, selic_df, on='mes')
     # registra as variaveis para a regressao linear onde x é a variavel independente (no caso a selic)
     x = merged['selic_diaria']
     # y é a variável dependente
     y = merged['inadimplencia']
-    # calcula o coeficiente da reta de regressão linear onde 'm' é a inclinação e 'b' é o intercepto
-    m, b = np.polyfit(x, y, 1)
+    # calcula de uma vez (somas acumuladas) a correlação de pearson, a reta de regressão
+    # (m é a inclinação e b o intercepto), os valores em janela movel e por defasagem
+    with medir('correlacao.analisar'):
+        resultado = analisar(x, y, config.CORRELACAO_JANELA, config.CORRELACAO_DEFASAGEM_MAXIMA)
+    correl = resultado['correlacao']
+    m, b = resultado['inclinacao'], resultado['intercepto']
 
     # a partir daqui vamos gerar o gráfico
     fig = go.Figure()
@@ -295,7 +580,7 @@ def analisar_correlacao():
         x = x,
         y = y,
         mode = 'markers',
-        name = 'Dados'
+        name = 'Dados',
         marker=dict(
             color = 'rgba(152, 0, 0, .8)',
             size = 12, 
@@ -316,6 +601,234 @@ def analisar_correlacao():
 
     )
     )
+    fig.update_layout(
+        title = f'Correlação Selic x Inadimplencia: {correl:.2f}',
+        xaxis_title = 'Selic',
+        yaxis_title = 'Inadimplencia (%)',
+        template = 'plotly_dark'
+    )
+
+    # correlação em janela movel: cada ponto é a janela que termina naquele mês
+    movel = resultado['movel']
+    fig_movel = go.Figure()
+    fig_movel.add_trace(go.Scatter(
+        x = merged['mes'].iloc[config.CORRELACAO_JANELA - 1:],
+        y = movel['correlacao'],
+        mode = 'lines',
+        name = 'Correlação',
+        customdata = np.column_stack([movel['beta'], movel['intercepto']]),
+        hovertemplate = 'Correlação: %{y:.2f}<br>Beta: %{customdata[0]:.3f}<br>Intercepto: %{customdata[1]:.3f}<extra></extra>'
+    ))
+    fig_movel.update_layout(
+        title = f'Correlação movel ({config.CORRELACAO_JANELA} meses)',
+        xaxis_title = 'Mês',
+        yaxis_title = 'Correlação',
+        template = 'plotly_dark'
+    )
+
+    # selic antecipando a inadimplencia em k meses
+    fig_defasada = go.Figure()
+    fig_defasada.add_trace(go.Bar(
+        x = list(range(config.CORRELACAO_DEFASAGEM_MAXIMA + 1)),
+        y = resultado['defasada'],
+        name = 'Correlação'
+    ))
+    fig_defasada.update_layout(
+        title = 'Correlação com a Selic defasada',
+        xaxis_title = 'Meses de antecedencia da Selic',
+        yaxis_title = 'Correlação',
+        template = 'plotly_dark'
+    )
+
+    with medir('correlacao.to_html'):
+        html_01 = fig.to_html(full_html = False, include_plotlyjs = plotlyjs())
+        html_02 = fig_movel.to_html(full_html = False, include_plotlyjs = False)
+        html_03 = fig_defasada.to_html(full_html = False, include_plotlyjs = False)
+    return render_template_string('''
+        <html>
+            <head>
+                <title> Correlação Selic x Inadimplencia </title>
+            </head>
+            <body>
+                <h1> Correlação Selic x Inadimplencia </h1>
+                <p> Correlação: {{ correl }} | Reta: inadimplencia = {{ m }} * selic + {{ b }} </p>
+                {{ reserva01|safe }}
+                {{ reserva02|safe }}
+                {{ reserva03|safe }}
+                <br><a href="{{ voltar }}">Voltar</a>
+            </body>
+        </html>
+    ''',
+        correl = f'{correl:.4f}', m = f'{m:.4f}', b = f'{b:.4f}',
+        reserva01 = html_01, reserva02 = html_02, reserva03 = html_03,
+        voltar = rotas[0]
+    )
+
+@app.route(rotas[6])
+def grafico3d():
+    with conexao(caminhoBd) as conn:
+        versao = versao_dados(conn)
+
+    return resposta_com_etag(f'grafico3d-{versao}', lambda: cache_graficos.obter_ou_calcular(
+        ('grafico3d', versao), lambda: montar_grafico3d(versao)
+    ))
+
+def montar_grafico3d(versao):
+    import numpy as np
+    import pandas as pd
+    import plotly.graph_objs as go
+    from agrupamento import agrupar
+    with medir('grafico3d.read_sql_query'), conexao(caminhoBd) as conn:
+        merged = pd.read_sql_query('''
+            SELECT i.mes, s.media AS selic_diaria, i.ultimo AS inadimplencia
+            FROM inadimplencia_mensal AS i
+            JOIN selic_mensal AS s ON s.mes = i.mes
+            ORDER BY i.mes
+        ''', conn)
+    if len(merged) < 2:
+        return render_template_string('''
+            <h1> Observabilidade em 3D </h1>
+            <p> Sao necessarios pelo menos dois meses com selic e inadimplencia. </p>
+            <a href="{{ voltar }}">Voltar</a>
+        ''', voltar = rotas[0])
+
+    # o modelo ajustado fica guardado por versao dos dados: so reajusta depois de um upload/edicao
+    def ajustar():
+        with medir('grafico3d.agrupar'):
+            return agrupar(
+                merged['selic_diaria'],
+                merged['inadimplencia'],
+                config.GRAFICO3D_K_MAXIMO,
+                config.GRAFICO3D_LIMITE_MINIBATCH,
+                config.GRAFICO3D_K
+            )
+    grupos = cache_modelos.obter_ou_calcular(versao, ajustar)
+
+    fig = go.Figure()
+    fig.add_trace(go.Scatter3d(
+        x = merged['selic_diaria'],
+        y = merged['inadimplencia'],
+        z = np.arange(len(merged)),
+        mode = 'markers',
+        name = 'Meses',
+        text = merged['mes'],
+        marker = dict(
+            size = 5,
+            color = grupos['rotulos'],
+            colorscale = 'Viridis',
+            opacity = 0.85
+        ),
+        hovertemplate = 'Mês: %{text}<br>Selic: %{x:.4f}<br>Inadimplencia: %{y:.2f}%<extra></extra>'
+    ))
+    fig.add_trace(go.Scatter3d(
+        x = grupos['centros'][:, 0],
+        y = grupos['centros'][:, 1],
+        z = grupos['centros'][:, 2],
+        mode = 'markers',
+        name = 'Centros',
+        marker = dict(size = 10, color = 'red', symbol = 'diamond')
+    ))
+    fig.update_layout(
+        title = f"Grupos de meses (KMeans, k = {grupos['k']})",
+        scene = dict(
+            xaxis_title = 'Selic',
+            yaxis_title = 'Inadimplencia',
+            zaxis_title = 'Mês (indice)'
+        ),
+        template = 'plotly_dark'
+    )
+    with medir('grafico3d.to_html'):
+        html_3d = fig.to_html(full_html = False, include_plotlyjs = plotlyjs())
+    return render_template_string('''
+        <html>
+            <head><title> Observabilidade em 3D </title></head>
+            <body>
+                {{ reserva01|safe }}
+                <br><a href="{{ voltar }}">Voltar</a>
+            </body>
+        </html>
+    ''', reserva01 = html_3d, voltar = rotas[0])
+
+@app.route(rotas[8])
+def api_series():
+    # devolve a serie em colunas: {"mes": [...], "media": [...]} em vez de uma lista de linhas
+    # ex: /api/series?serie=selic&inicio=2023-01&fim=2023-06&campos=media,maximo
+    # com &pontos=N a serie e reduzida (LTTB pelo primeiro campo) a N pontos
+    serie = request.args.get('serie', 'selic')
+    if serie not in RESUMOS:
+        return jsonify({"Erro":"Serie Invalida"}), 400
+
+    campos = request.args.get('campos')
+    campos = campos.split(',') if campos else COLUNAS_RESUMO
+    if any(c not in COLUNAS_RESUMO for c in campos):
+        return jsonify({"Erro":f"Campos validos: {', '.join(COLUNAS_RESUMO)}"}), 400
+    if len(set(campos)) != len(campos):
+        return jsonify({"Erro":"Campos repetidos"}), 400
+    # sempre na ordem de COLUNAS_RESUMO: o SQL montado so tem 2^5 variacoes
+    campos = [c for c in COLUNAS_RESUMO if c in campos]
+
+    where, parametros = filtro_meses(request.args.get('inicio'), request.args.get('fim'))
+
+    with medir('api_series.consulta'), conexao(caminhoBd) as conn:
+        versao = versao_dados(conn)
+        linhas = conn.execute(f'''
+            SELECT mes, {', '.join(campos)} FROM {RESUMOS[serie][0]}
+            {where} ORDER BY mes
+        ''', parametros).fetchall()
+
+    if request.args.get('pontos'):
+        pontos = ler_pontos()
+        if pontos is None:
+            return jsonify({"Erro":"Quantidade de pontos invalida"}), 400
+        from reducao import lttb
+        with medir('api_series.lttb'):
+            valores = [linha[1] for linha in linhas]
+            linhas = [linhas[i] for i in lttb(valores, pontos)]
+
+    colunas = list(zip(*linhas)) or [()] * (len(campos) + 1)
+    corpo = json.dumps({
+        "serie": serie,
+        "versao": versao,
+        "colunas": {nome: list(valores) for nome, valores in zip(['mes'] + campos, colunas)}
+    }, separators=(',', ':')).encode('utf-8')
+
+    resposta = make_response(corpo)
+    resposta.mimetype = 'application/json'
+    if len(corpo) >= config.API_GZIP_MINIMO and 'gzip' in request.accept_encodings:
+        resposta.set_data(gzip.compress(corpo))
+        resposta.headers['Content-Encoding'] = 'gzip'
+    resposta.headers['Vary'] = 'Accept-Encoding'
+    return resposta
+
+@app.route(rotas[11])
+def metrics():
+    # histogramas de tempo por rota, comando SQL e etapa, no formato texto do Prometheus
+    resposta = make_response(metricas.texto())
+    resposta.mimetype = 'text/plain; version=0.0.4'
+    return resposta
+
+def plotlyjs():
+    # valor do include_plotlyjs dos graficos: o cdn ou o endereco da copia local,
+    # com a versao na url para o navegador poder guardar o arquivo por muito tempo
+    if config.PLOTLY_JS == 'cdn':
+        return 'cdn'
+    import plotly
+    return url_for('plotly_local', versao = plotly.__version__)
+
+@app.route(rotas[9])
+def plotly_local(versao):
+    import plotly
+    from plotly.offline import get_plotlyjs
+    # o endereco com a versao e guardado para sempre pelo navegador:
+    # so responde pela versao instalada
+    if versao != plotly.__version__:
+        return jsonify({"Erro":"Versao do plotly.js nao encontrada"}), 404
+    return resposta_com_etag(
+        f'plotly-{plotly.__version__}',
+        get_plotlyjs,
+        cache_control = 'public, max-age=31536000, immutable',
+        mimetype = 'application/javascript'
+    )
 
 if __name__ == '__main__':
     init_db()
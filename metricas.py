@@ -0,0 +1,165 @@
+'''
+Metricas de tempo (requisicoes, comandos SQL e etapas de pandas/plotly)
+expostas no formato texto do Prometheus
+Autor: Luis Henrique Ponciano
+'''
+
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+import config
+
+
+class Histograma:
+    """
+    Histograma cumulativo do Prometheus: para cada combinacao de rotulos guarda
+    quantas medidas cairam em cada limite, a soma e o total de medidas.
+    Com 'maximo_series', combinacoes novas alem desse limite vao todas para
+    a serie 'outros' (o numero de series exportadas nunca passa do limite + 1)
+    """
+
+    def __init__(self, nome: str, ajuda: str, rotulos: tuple, limites=None, maximo_series=None):
+        self.nome = nome
+        self.ajuda = ajuda
+        self.rotulos = rotulos
+        self.limites = tuple(sorted(limites or config.METRICAS_LIMITES))
+        self.maximo_series = maximo_series
+        self.series = {}
+        self.trava = threading.Lock()
+
+    def observar(self, valor: float, *rotulos) -> None:
+        with self.trava:
+            serie = self.series.get(rotulos)
+            if serie is None and self.maximo_series is not None and len(self.series) >= self.maximo_series:
+                rotulos = ('outros',) * len(self.rotulos)
+                serie = self.series.get(rotulos)
+            if serie is None:
+                serie = self.series[rotulos] = [[0] * len(self.limites), 0.0, 0]
+            contagens = serie[0]
+            for i, limite in enumerate(self.limites):
+                if valor <= limite:
+                    contagens[i] += 1
+            serie[1] += valor
+            serie[2] += 1
+
+    def texto(self) -> list:
+        linhas = [f'# HELP {self.nome} {self.ajuda}', f'# TYPE {self.nome} histogram']
+        with self.trava:
+            series = [(r, list(s[0]), s[1], s[2]) for r, s in self.series.items()]
+        for rotulos, contagens, soma, total in sorted(series):
+            base = ','.join(f'{n}="{_escapar(v)}"' for n, v in zip(self.rotulos, rotulos))
+            prefixo = base + ',' if base else ''
+            for limite, contagem in zip(self.limites, contagens):
+                linhas.append(f'{self.nome}_bucket{{{prefixo}le="{limite:g}"}} {contagem}')
+            linhas.append(f'{self.nome}_bucket{{{prefixo}le="+Inf"}} {total}')
+            chave = f'{{{base}}}' if base else ''
+            linhas.append(f'{self.nome}_sum{chave} {soma:.6f}')
+            linhas.append(f'{self.nome}_count{chave} {total}')
+        return linhas
+
+
+def _escapar(valor) -> str:
+    return str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', ' ')
+
+
+requisicoes = Histograma(
+    'http_requisicao_duracao_segundos',
+    'Tempo de resposta por rota',
+    ('rota', 'metodo', 'status')
+)
+comandos_sql = Histograma(
+    'sql_comando_duracao_segundos',
+    'Tempo de execute/executemany por comando SQL',
+    ('comando',),
+    maximo_series = config.METRICAS_SQL_MAXIMO
+)
+etapas = Histograma(
+    'etapa_duracao_segundos',
+    'Tempo das etapas de pandas e plotly dentro das rotas',
+    ('etapa',)
+)
+HISTOGRAMAS = [requisicoes, comandos_sql, etapas]
+
+
+@contextmanager
+def medir(etapa: str):
+    """
+    Cronometra um trecho: with medir('graficos.to_html'): ...
+    """
+    if not config.METRICAS_ATIVAS:
+        yield
+        return
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        etapas.observar(time.perf_counter() - inicio, etapa)
+
+
+def rotulo_sql(sql: str) -> str:
+    # os comandos usam '?' nos valores, mas partes do SQL sao montadas nas rotas
+    # (filtros, colunas): o histograma limita as variacoes em METRICAS_SQL_MAXIMO
+    return ' '.join(sql.split())[:config.METRICAS_SQL_TAMANHO]
+
+
+class CursorMedido(sqlite3.Cursor):
+    # so o primeiro passo do comando roda no execute: o resto de um SELECT
+    # grande aparece no tempo da etapa que faz o fetch (ex: read_sql_query)
+
+    def execute(self, sql, parametros=()):
+        inicio = time.perf_counter()
+        try:
+            return super().execute(sql, parametros)
+        finally:
+            comandos_sql.observar(time.perf_counter() - inicio, rotulo_sql(sql))
+
+    def executemany(self, sql, parametros):
+        inicio = time.perf_counter()
+        try:
+            return super().executemany(sql, parametros)
+        finally:
+            comandos_sql.observar(time.perf_counter() - inicio, rotulo_sql(sql))
+
+
+class ConexaoMedida(sqlite3.Connection):
+    """
+    Conexao sqlite que cronometra cada comando (usada pelo banco.py com METRICAS_SQL)
+    """
+
+    def cursor(self, factory=CursorMedido):
+        return super().cursor(factory)
+
+    def execute(self, sql, parametros=()):
+        return self.cursor().execute(sql, parametros)
+
+    def executemany(self, sql, parametros):
+        return self.cursor().executemany(sql, parametros)
+
+
+def registrar(app) -> None:
+    """
+    Liga o cronometro de requisicoes no app Flask. A rota entra pelo molde
+    (ex: /upload/status/<tarefa_id>) para nao criar uma serie por id
+    """
+    from flask import g, request
+
+    @app.before_request
+    def _inicio():
+        g.metricas_inicio = time.perf_counter()
+
+    @app.after_request
+    def _fim(resposta):
+        inicio = g.pop('metricas_inicio', None)
+        if inicio is not None:
+            rota = request.url_rule.rule if request.url_rule else 'sem_rota'
+            requisicoes.observar(time.perf_counter() - inicio, rota, request.method, resposta.status_code)
+        return resposta
+
+
+def texto() -> str:
+    linhas = []
+    for histograma in HISTOGRAMAS:
+        linhas.extend(histograma.texto())
+    return '\n'.join(linhas) + '\n'
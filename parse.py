@@ -8,76 +8,230 @@
 # Versão: 1.0
 # Data: 28-08-25
 
-def interpretador(codigo, variaveis=None):
-    # quebra o codigo em linhas
+import hashlib
+import marshal
+import os
+import sys
+
+from cache import CacheLRU
+
+# O interpretador trabalha em duas etapas:
+# 1) compilar: quebra o codigo em linhas e transforma cada comando, uma unica vez,
+#    em uma instrucao (tupla) com o codigo da operacao e os argumentos ja separados.
+#    Os comandos de dentro do 'se ... então' e do 'enquanto ... faça' viram blocos
+#    de instrucoes ja compilados, em vez de texto para reinterpretar.
+# 2) executar: percorre as instrucoes e chama a funcao da tabela de despacho de cada uma.
+
+# codigos das operacoes
+DEFINIR = 0
+MOSTRAR = 1
+SE = 2
+ENQUANTO = 3
+ERRO = 4
+
+
+def compilar_texto(expr):
+    # "O nome é" + nome  ->  (('O nome é', True), ('nome', False))
+    partes = []
+    for p in expr.split('+'):
+        p = p.strip()
+        if len(p) >= 2 and p[0] == '"':
+            partes.append((p[1:-1], True))
+        else:
+            partes.append((p, False))
+    return tuple(partes)
+
+
+def compilar_linha(linha):
+    if linha.startswith("definir"):
+        resto = linha[7:].strip()
+        if " como " not in resto:
+            return (ERRO, f'Erro de sintaxe na linha: {linha}')
+        nome, valor = resto.split(" como ", 1)
+        valor = valor.strip()
+        if len(valor) >= 2 and valor[0] == '"' and valor[-1] == '"':
+            valor = valor[1:-1]
+        return (DEFINIR, nome.strip(), valor)
+
+    if linha.startswith("mostrar"):
+        return (MOSTRAR, compilar_texto(linha[7:].strip()))
+
+    if linha.startswith("se"):
+        resto = linha[3:].strip()
+        if " então " not in resto:
+            return (ERRO, f'Erro de sintaxe na linha: {linha}')
+        condicao, comando = resto.split(" então ", 1)
+        return (SE, condicao.strip(), compilar(comando.strip()))
+
+    if linha.startswith("enquanto"):
+        resto = linha[8:].strip()
+        if " faça " not in resto:
+            return (ERRO, f'Erro de sintaxe na linha: {linha}')
+        condicao, comando = resto.split(" faça ", 1)
+        return (ENQUANTO, condicao.strip(), compilar(comando.strip()))
+
+    return (ERRO, f'Comando não foi reconhecido{linha}')
+
+
+def compilar(codigo):
+    # quebra o codigo em linhas e devolve a lista de instrucoes
+    programa = []
+    for linha in codigo.split('\n'):
+        linha = linha.strip() # remove espaços desnecessarios
+        if linha:
+            programa.append(compilar_linha(linha))
+    return tuple(programa)
+
+
+class SaidaBufferizada:
+    # junta as linhas do 'mostrar' e entrega ao escritor em lotes,
+    # com um unico write por lote em vez de um print por linha
+
+    def __init__(self, escritor=None, tamanho_lote=256):
+        self.escritor = escritor or sys.stdout.write
+        self.tamanho_lote = tamanho_lote
+        self.linhas = []
+
+    def escrever(self, linha):
+        self.linhas.append(linha)
+        if len(self.linhas) >= self.tamanho_lote:
+            self.descarregar()
+
+    def descarregar(self):
+        if self.linhas:
+            self.linhas.append('')
+            self.escritor('\n'.join(self.linhas))
+            self.linhas = []
+
+
+class Maquina:
+    # executa as instrucoes de um programa compilado
+
+    def __init__(self, variaveis, max_iteracoes=1, saida=None):
+        self.variaveis = variaveis
+        self.saida = saida or SaidaBufferizada()
+        # o 'enquanto' para depois de max_iteracoes voltas (evita loops infinitos)
+        self.max_iteracoes = max_iteracoes
+        self.despacho = {
+            DEFINIR: self.definir,
+            MOSTRAR: self.mostrar,
+            SE: self.se,
+            ENQUANTO: self.enquanto,
+            ERRO: self.erro,
+        }
+
+    def executar(self, programa):
+        despacho = self.despacho
+        for instrucao in programa:
+            despacho[instrucao[0]](instrucao)
+
+    def texto(self, partes):
+        variaveis = self.variaveis
+        return "".join([p if literal else str(variaveis.get(p, p)) for p, literal in partes])
+
+    def verdadeiro(self, condicao):
+        # a condição pode ser o literal verdadeiro/falso ou uma variavel com esse valor
+        return self.variaveis.get(condicao, condicao) == "verdadeiro"
+
+    def definir(self, instrucao):
+        self.variaveis[instrucao[1]] = instrucao[2]
+
+    def mostrar(self, instrucao):
+        self.saida.escrever(self.texto(instrucao[1]))
+
+    def se(self, instrucao):
+        if self.verdadeiro(instrucao[1]):
+            self.executar(instrucao[2])
+
+    def enquanto(self, instrucao):
+        _, condicao, bloco = instrucao
+        voltas = 0
+        #verifica a condição do looping (por enquanto , consideramos verdadeiro ou falso)
+        while voltas < self.max_iteracoes and self.verdadeiro(condicao):
+            self.executar(bloco) # executa o bloco já compilado dentro do loop
+            voltas += 1
+
+    def erro(self, instrucao):
+        self.saida.escrever(instrucao[1])
+
+
+# Cache dos programas compilados, pela hash do codigo fonte:
+# - em memoria (LRU), para rodar o mesmo script varias vezes no mesmo processo
+# - opcionalmente em disco, como os .pyc do python, para reaproveitar entre execucoes
+#   (defina QUARTETO_CACHE com a pasta, ou mude PASTA_CACHE)
+programas = CacheLRU(128)
+PASTA_CACHE = os.environ.get('QUARTETO_CACHE')
+# muda sempre que o formato das instrucoes mudar, invalidando o que esta em disco;
+# como no 'magic' dos .pyc, leva a versao do python e do marshal: uma pasta
+# QUARTETO_CACHE compartilhada nunca e lida por outro interpretador
+ASSINATURA = b'QTC1-%d.%d-m%d' % (sys.version_info[0], sys.version_info[1], marshal.version)
+
+
+def arquivo_cache(chave):
+    return os.path.join(PASTA_CACHE, f'{chave}.qtc')
+
+
+def ler_do_disco(chave):
+    try:
+        with open(arquivo_cache(chave), 'rb') as f:
+            dados = f.read()
+    except OSError:
+        return None
+    if not dados.startswith(ASSINATURA):
+        return None
+    try:
+        return marshal.loads(dados[len(ASSINATURA):])
+    except (ValueError, EOFError, TypeError):
+        return None
+
+
+def gravar_no_disco(chave, programa):
+    try:
+        os.makedirs(PASTA_CACHE, exist_ok=True)
+        temporario = f'{arquivo_cache(chave)}.{os.getpid()}.tmp'
+        with open(temporario, 'wb') as f:
+            f.write(ASSINATURA + marshal.dumps(programa))
+        os.replace(temporario, arquivo_cache(chave)) # troca atomica: ninguem le arquivo pela metade
+    except OSError:
+        pass # sem permissao ou disco cheio: segue so com o cache em memoria
+
+
+def carregar(codigo):
+    # devolve o programa compilado, compilando so se nao estiver em nenhum cache
+    chave = hashlib.sha256(codigo.encode('utf-8')).hexdigest()
+    programa = programas.obter(chave)
+    if programa is not None:
+        return programa
+    if PASTA_CACHE:
+        programa = ler_do_disco(chave)
+    if programa is None:
+        programa = compilar(codigo)
+        if PASTA_CACHE:
+            gravar_no_disco(chave, programa)
+    programas.guardar(chave, programa)
+    return programa
+
+
+def interpretador(codigo, variaveis=None, max_iteracoes=1, saida=None):
+    # saida: qualquer objeto com escrever(linha) e descarregar(), por padrao
+    # uma SaidaBufferizada que escreve no stdout (ex: SaidaBufferizada(arquivo.write, 1000))
     if variaveis is None:
         variaveis = {}
-    
-    def eval_texto(expr):
-        partes = [p.strip() for p in expr.split('+')]
-        out = ""
-        for p in partes:
-            if len(p) >= 2 and p[0] == '"':
-                out += p[1:-1]
-            else:
-                out += str(variaveis.get(p, p))
-        return out
-    
-    linhas = codigo.split('\n')
-    for linha in linhas:
-        linha = linha.strip() # remove espaços desnecessarios
-        if not linha:
-            continue
-
-
-        if linha.startswith("definir"):
-            resto = linha[7:].strip()
-            if " como " not in resto:
-                print(f'Erro de sintaxe na linha: {linha}')
-                continue
-            nome, valor = resto.split(" como ", 1)
-            nome = nome.strip()
-            valor = valor.strip()
-            if len(valor) >= 2 and valor[0] == '"' and valor[1] == '"':
-                valor = valor[1:-1]
-                variaveis[nome] = valor
-
-
-        elif linha.startswith("mostrar"):
-            conteudo = linha[7:].strip()
-            print(eval_texto(conteudo))
-
-        elif linha.startswith("se"):
-            resto = linha[3:].strip()
-            if " então " not in resto:
-                print(f'Erro de sintaxe na linha: {linha}')
-                continue
-            condicao, comando = resto.split(" então ", 1)
-            if condicao.strip() == "verdadeiro":
-                interpretador(comando.strip(), variaveis)
-        elif linha.startswith("enquanto"):
-            resto = linha[8:].strip()
-            if " faça " not in resto:
-                print(f'Erro de sintaxe na linha: {linha}')
-                continue
-
-
-
-
-            
-
-            #verifica a condição do looping (por enquanto , consideramos verdadeiro ou falso)
-            while condicao == 'verdadeiro':
-                interpretador(comando) # executa o comando dentro do loop
-                break # evita loops infinitos para esse exemplo
-        else:
-            print(f'Comando não foi reconhecido{linha}')
-codigo = """
-    definir nome como "lalala"
-    mostrar "O nome é" + nome    
-    se verdadeiro então mostrar "Isso é verdadeiro"
-    enquanto verdadeiro faça mostrar "Dentro do laço"
-"""
-interpretador(codigo)
+    if saida is None:
+        saida = SaidaBufferizada()
+    programa = carregar(codigo)
+    try:
+        Maquina(variaveis, max_iteracoes, saida).executar(programa)
+    finally:
+        saida.descarregar() # o que ficou no buffer sai mesmo se der erro
+    return variaveis
 
 
+if __name__ == '__main__':
+    codigo = """
+        definir nome como "lalala"
+        mostrar "O nome é" + nome    
+        se verdadeiro então mostrar "Isso é verdadeiro"
+        enquanto verdadeiro faça mostrar "Dentro do laço"
+    """
+    interpretador(codigo)
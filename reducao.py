@@ -0,0 +1,57 @@
+'''
+Reducao de pontos das series para os graficos (Largest-Triangle-Three-Buckets)
+Autor: Luis Henrique Ponciano
+'''
+
+import numpy as np
+
+
+def lttb(y, alvo: int, x=None) -> np.ndarray:
+    """
+    Escolhe 'alvo' pontos que preservam o desenho da serie e devolve os indices
+    (em ordem). O primeiro e o ultimo ponto sempre ficam; o resto e dividido em
+    alvo - 2 baldes e de cada balde fica o ponto que forma o maior triangulo com
+    o ponto escolhido no balde anterior e a media do balde seguinte.
+    - as medias de todos os baldes saem de uma unica soma acumulada e a area
+      e calculada de uma vez para todos os pontos do balde
+    - x padrao: posicao do ponto (meses igualmente espacados)
+    - valores NaN sao interpolados so para a escolha (o indice continua valido)
+    """
+    y = np.asarray(y, dtype=float)
+    n = len(y)
+    if not alvo or alvo >= n or alvo < 3:
+        return np.arange(n)
+    x = np.arange(n, dtype=float) if x is None else np.asarray(x, dtype=float)
+
+    finito = np.isfinite(y)
+    if not finito.all():
+        if not finito.any():
+            return np.linspace(0, n - 1, alvo).astype(np.intp)
+        y = np.interp(x, x[finito], y[finito])
+
+    # alvo - 2 baldes entre o primeiro e o ultimo ponto
+    limites = np.linspace(1, n - 1, alvo - 1).astype(np.intp)
+    tamanhos = np.diff(limites)
+    soma_x = np.concatenate(([0.0], np.cumsum(x)))
+    soma_y = np.concatenate(([0.0], np.cumsum(y)))
+    media_x = (soma_x[limites[1:]] - soma_x[limites[:-1]]) / tamanhos
+    media_y = (soma_y[limites[1:]] - soma_y[limites[:-1]]) / tamanhos
+    # ponto C de cada balde: media do proximo (o ultimo balde usa o ultimo ponto)
+    c_x = np.append(media_x[1:], x[-1])
+    c_y = np.append(media_y[1:], y[-1])
+
+    escolhidos = np.empty(alvo, dtype=np.intp)
+    escolhidos[0] = 0
+    escolhidos[-1] = n - 1
+    a = 0
+    for i in range(alvo - 2):
+        inicio, fim = limites[i], limites[i + 1]
+        a_x, a_y = x[a], y[a]
+        # o dobro da area do triangulo (A, ponto do balde, C)
+        area = np.abs(
+            (a_x - c_x[i]) * (y[inicio:fim] - a_y)
+            - (a_x - x[inicio:fim]) * (c_y[i] - a_y)
+        )
+        a = inicio + int(np.argmax(area))
+        escolhidos[i + 1] = a
+    return escolhidos
@@ -0,0 +1,93 @@
+'''
+Fila de tarefas em segundo plano (ex: ingestao do /upload) com progresso consultavel
+Autor: Luis Henrique Ponciano
+'''
+
+import threading
+import time
+import traceback
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+
+class Progresso:
+    """
+    Estado de uma tarefa. A funcao da tarefa recebe este objeto e chama
+    atualizar(...) / somar(...) para publicar o andamento
+    """
+
+    def __init__(self):
+        self.trava = threading.Lock()
+        self.dados = {
+            'estado': 'na fila',
+            'criado_em': time.time(),
+            'iniciado_em': None,
+            'terminado_em': None,
+        }
+
+    def atualizar(self, **campos) -> None:
+        with self.trava:
+            self.dados.update(campos)
+
+    def somar(self, **campos) -> None:
+        with self.trava:
+            for nome, valor in campos.items():
+                self.dados[nome] = self.dados.get(nome, 0) + valor
+
+    def copia(self) -> dict:
+        with self.trava:
+            return dict(self.dados)
+
+    @property
+    def terminou(self) -> bool:
+        with self.trava:
+            return self.dados['estado'] in ('concluido', 'erro')
+
+
+class FilaTarefas:
+    """
+    Executa as tarefas em um pool de threads e guarda o progresso de cada uma.
+    So as tarefas ja terminadas sao descartadas quando passa de 'historico'.
+    O estado fica na memoria do processo: com varios workers do servidor,
+    a consulta precisa cair no mesmo processo que recebeu a tarefa
+    """
+
+    def __init__(self, trabalhadores: int, historico: int = 100):
+        self.executor = ThreadPoolExecutor(max_workers=trabalhadores, thread_name_prefix='tarefa')
+        self.historico = historico
+        self.tarefas = OrderedDict()
+        self.trava = threading.Lock()
+
+    def enviar(self, funcao, *args, **kwargs) -> str:
+        tarefa_id = uuid.uuid4().hex
+        progresso = Progresso()
+        with self.trava:
+            self.tarefas[tarefa_id] = progresso
+            self._limpar()
+        self.executor.submit(self._rodar, progresso, funcao, args, kwargs)
+        return tarefa_id
+
+    def status(self, tarefa_id: str):
+        with self.trava:
+            progresso = self.tarefas.get(tarefa_id)
+        return progresso.copia() if progresso else None
+
+    def _rodar(self, progresso, funcao, args, kwargs) -> None:
+        progresso.atualizar(estado='executando', iniciado_em=time.time())
+        try:
+            resultado = funcao(*args, progresso=progresso, **kwargs)
+        except Exception as erro:
+            traceback.print_exc()
+            progresso.atualizar(estado='erro', erro=str(erro), terminado_em=time.time())
+        else:
+            progresso.atualizar(estado='concluido', resultado=resultado, terminado_em=time.time())
+
+    def _limpar(self) -> None:
+        excesso = len(self.tarefas) - self.historico
+        for tarefa_id in list(self.tarefas):
+            if excesso <= 0:
+                break
+            if self.tarefas[tarefa_id].terminou:
+                del self.tarefas[tarefa_id]
+                excesso -= 1
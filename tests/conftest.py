@@ -0,0 +1,5 @@
+# os modulos do projeto ficam na raiz do repositorio (um nivel acima)
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,60 @@
+'''
+Confere correlacao.py contra np.corrcoef / np.polyfit calculados janela a janela
+'''
+
+import numpy as np
+import pytest
+
+from correlacao import analisar, correlacao_defasada, regressao_movel
+
+
+@pytest.fixture
+def series():
+    rng = np.random.default_rng(7)
+    x = np.cumsum(rng.normal(size=120)) + 10
+    y = 0.5 * x + rng.normal(size=120)
+    return x, y
+
+
+def test_amostra_inteira_igual_corrcoef_e_polyfit(series):
+    x, y = series
+    r = analisar(x, y, janela=12, defasagem_maxima=6)
+    m, b = np.polyfit(x, y, 1)
+    assert r['correlacao'] == pytest.approx(np.corrcoef(x, y)[0, 1], abs=1e-9)
+    assert r['inclinacao'] == pytest.approx(m, abs=1e-9)
+    assert r['intercepto'] == pytest.approx(b, abs=1e-9)
+
+
+def test_janela_movel_igual_calculo_por_janela(series):
+    x, y = series
+    janela = 12
+    r = regressao_movel(x, y, janela)
+    assert len(r['correlacao']) == len(x) - janela + 1
+    for i in range(len(x) - janela + 1):
+        xs, ys = x[i:i + janela], y[i:i + janela]
+        m, b = np.polyfit(xs, ys, 1)
+        assert r['correlacao'][i] == pytest.approx(np.corrcoef(xs, ys)[0, 1], abs=1e-9)
+        assert r['beta'][i] == pytest.approx(m, abs=1e-9)
+        assert r['intercepto'][i] == pytest.approx(b, abs=1e-9)
+
+
+def test_defasagem_igual_corrcoef_deslocado(series):
+    x, y = series
+    r = correlacao_defasada(x, y, 10)
+    for k in range(11):
+        esperado = np.corrcoef(x[:len(x) - k], y[k:])[0, 1]
+        assert r[k] == pytest.approx(esperado, abs=1e-9)
+
+
+def test_janela_constante_vira_nan():
+    x = np.array([1.0] * 6 + [1, 2, 3, 4, 5, 6])
+    y = np.arange(12, dtype=float)
+    r = regressao_movel(x, y, 6)
+    assert np.isnan(r['correlacao'][0]) and np.isnan(r['beta'][0])
+    assert r['correlacao'][-1] == pytest.approx(1.0)
+
+
+def test_defasagem_maior_que_a_serie():
+    r = correlacao_defasada(np.arange(5.0), np.arange(5.0), 8)
+    assert len(r) == 9
+    assert np.isnan(r[3:]).all()
@@ -0,0 +1,43 @@
+'''
+Confere ingestao.meses_de_datas contra pd.to_datetime + to_period('M')
+'''
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from ingestao import AgregadorMensal, formatar_meses, meses_de_datas
+
+
+def meses_pandas(datas):
+    return pd.to_datetime(pd.Series(datas), format="%d/%m/%Y").dt.to_period('M').astype(str).tolist()
+
+
+def test_igual_ao_to_datetime_em_datas_aleatorias():
+    rng = np.random.default_rng(11)
+    dias = pd.Timestamp('1900-01-01') + pd.to_timedelta(rng.integers(0, 200 * 365, 5000), unit='D')
+    datas = list(dias.strftime('%d/%m/%Y'))
+    # repetidas e sem zero a esquerda (caem no caminho do pd.to_datetime)
+    datas += datas[:100] + ['1/3/2011', '9/12/2020', '29/02/2000']
+    assert formatar_meses(meses_de_datas(pd.Series(datas))) == meses_pandas(datas)
+
+
+@pytest.mark.parametrize('data', ['31/02/2023', '29/02/1900', '13/13/2020', '00/01/2020', 'aa/bb/cccc'])
+def test_data_invalida_continua_dando_erro(data):
+    with pytest.raises(ValueError):
+        meses_de_datas(pd.Series([data]))
+
+
+def test_data_vazia_vira_zero():
+    np.testing.assert_array_equal(meses_de_datas(pd.Series(['15/03/2024', None])), [202403, 0])
+    assert len(meses_de_datas(pd.Series([], dtype=object))) == 0
+
+
+def test_agregador_devolve_mes_em_texto():
+    bloco = pd.DataFrame({'valor': [1.0, 3.0, 5.0], 'mes': meses_de_datas(pd.Series(['01/12/2023', '02/12/2023', '02/01/2024']))})
+    agregador = AgregadorMensal('valor')
+    agregador.adicionar(bloco)
+    mensal = agregador.mensal()
+    assert mensal['mes'].tolist() == ['2023-12', '2024-01']
+    assert mensal['media'].tolist() == [2.0, 5.0]
+    assert mensal['ultimo'].tolist() == [3.0, 5.0]
@@ -0,0 +1,39 @@
+'''
+Confere detect_columns (main.py) contra a busca original por candidatos
+'''
+
+import random
+
+from main import COLUMN_CANDIDATES, detect_columns
+
+
+def pick(colnames, candidates):
+    # busca da versao original do standardize_columns
+    for c in candidates:
+        if c in colnames:
+            return c
+    for c in candidates:
+        for col in colnames:
+            if c.lower() in col.lower():
+                return col
+    return None
+
+
+def test_igual_a_busca_original_em_cabecalhos_aleatorios():
+    rng = random.Random(3)
+    pedacos = [c for candidatos in COLUMN_CANDIDATES.values() for c in candidatos]
+    pedacos += ['id', 'data', 'x', 'cidade', 'LONG_NAME', 'Preço_Medio', 'my_lat_col', 'valores']
+    for _ in range(2000):
+        colunas = list(dict.fromkeys(
+            rng.choice(['', 'pre_', 'X']) + rng.choice(pedacos) + rng.choice(['', '_2', 'S'])
+            for _ in range(rng.randint(1, 8))
+        ))
+        rng.shuffle(colunas)
+        encontrado = detect_columns(colunas)
+        for campo, candidatos in COLUMN_CANDIDATES.items():
+            assert encontrado[campo] == pick(colunas, candidatos), colunas
+
+
+def test_nome_exato_tem_prioridade_sobre_trecho():
+    colunas = ['latitude_origem', 'lat', 'Longitude']
+    assert detect_columns(colunas) == {'lat': 'lat', 'lon': 'Longitude', 'custo': None, 'nome': None}
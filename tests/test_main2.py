@@ -0,0 +1,160 @@
+'''
+Gravacao do main2.py: upload repetido, mes novo, migracao de bancos antigos
+e edicao em lote
+'''
+
+import sqlite3
+
+import pandas as pd
+import pytest
+
+pytest.importorskip('flask')
+import main2
+
+INADIMPLENCIA = 'data;valor\n01/03/2011;3.17\n01/04/2011;3.24\n01/05/2011;3.30\n'
+SELIC = 'data;valor\n02/01/2023;0.05\n03/01/2023;0.07\n01/02/2023;0.06\n'
+
+
+@pytest.fixture
+def banco(tmp_path, monkeypatch):
+    caminho = str(tmp_path / 'dados.db')
+    monkeypatch.setattr(main2, 'caminhoBd', caminho)
+    return caminho
+
+
+def escrever(pasta, nome, texto):
+    caminho = pasta / nome
+    caminho.write_text(texto, encoding='utf-8')
+    return str(caminho)
+
+
+def linhas(caminho, sql):
+    with sqlite3.connect(caminho) as conn:
+        return conn.execute(sql).fetchall()
+
+
+def test_upload_repetido_nao_altera_nada(banco, tmp_path):
+    main2.init_db()
+    inad = escrever(tmp_path, 'inad.csv', INADIMPLENCIA)
+    selic = escrever(tmp_path, 'selic.csv', SELIC)
+    assert main2.ingerir(inad, selic)['Meses alterados'] == {'inadimplencia': 3, 'selic': 2}
+    versao = linhas(banco, 'SELECT geracao FROM versao_dados')
+
+    assert main2.ingerir(inad, selic)['Meses alterados'] == {'inadimplencia': 0, 'selic': 0}
+    # nada mudou: os caches continuam valendo
+    assert linhas(banco, 'SELECT geracao FROM versao_dados') == versao
+
+
+def test_mes_a_mais_altera_uma_linha(banco, tmp_path):
+    main2.init_db()
+    selic = escrever(tmp_path, 'selic.csv', SELIC)
+    main2.ingerir(escrever(tmp_path, 'inad.csv', INADIMPLENCIA), selic)
+
+    inad = escrever(tmp_path, 'inad2.csv', INADIMPLENCIA + '01/06/2011;3.41\n')
+    assert main2.ingerir(inad, selic)['Meses alterados'] == {'inadimplencia': 1, 'selic': 0}
+    assert linhas(banco, "SELECT inadimplencia FROM inadimplencia WHERE mes = '2011-06'") == [(3.41,)]
+
+
+def test_migra_tabela_diaria_do_to_sql(banco):
+    # formato antigo: to_sql(if_exists='replace') com uma linha por dia
+    with sqlite3.connect(banco) as conn:
+        pd.DataFrame({
+            'data': ['2020-01-02', '2020-01-31', '2020-02-03'],
+            'inadimplencia': [1.0, 2.0, 4.0],
+            'mes': ['2020-01', '2020-01', '2020-02']
+        }).to_sql('inadimplencia', conn, index=False)
+        pd.DataFrame({
+            'data': ['2020-01-02', '2020-01-03', '2020-02-03'],
+            'selic_diaria': [0.04, 0.06, 0.05],
+            'mes': ['2020-01', '2020-01', '2020-02']
+        }).to_sql('selic', conn, index=False)
+
+    main2.init_db()
+    main2.init_db()
+    # inadimplencia fica com o ultimo valor do mes, selic com a media
+    assert linhas(banco, 'SELECT * FROM inadimplencia ORDER BY mes') == [('2020-01', 2.0), ('2020-02', 4.0)]
+    assert linhas(banco, 'SELECT * FROM selic ORDER BY mes') == [('2020-01', pytest.approx(0.05)), ('2020-02', 0.05)]
+    # as linhas diarias sao mantidas
+    assert linhas(banco, 'SELECT COUNT(*) FROM inadimplencia_diario_legado') == [(3,)]
+    assert linhas(banco, 'SELECT COUNT(*) FROM selic_diario_legado') == [(3,)]
+
+
+def test_resumo_mensal_do_upload(banco, tmp_path):
+    main2.init_db()
+    main2.ingerir(escrever(tmp_path, 'inad.csv', INADIMPLENCIA), escrever(tmp_path, 'selic.csv', SELIC))
+    assert linhas(banco, "SELECT * FROM selic_mensal WHERE mes = '2023-01'") == [
+        ('2023-01', pytest.approx(0.06), 0.05, 0.07, 2, 0.07)
+    ]
+    assert linhas(banco, 'SELECT COUNT(*) FROM inadimplencia_mensal') == [(3,)]
+
+
+def test_resumo_mensal_da_migracao(banco):
+    with sqlite3.connect(banco) as conn:
+        pd.DataFrame({
+            'data': ['2020-01-31', '2020-01-02', '2020-02-03'],
+            'inadimplencia': [2.0, 1.0, 4.0],
+            'mes': ['2020-01', '2020-01', '2020-02']
+        }).to_sql('inadimplencia', conn, index=False)
+
+    main2.init_db()
+    assert linhas(banco, 'SELECT * FROM inadimplencia_mensal ORDER BY mes') == [
+        ('2020-01', 1.5, 1.0, 2.0, 2, 2.0),
+        ('2020-02', 4.0, 4.0, 4.0, 1, 4.0)
+    ]
+
+
+def test_resumo_criado_em_banco_ja_populado(banco):
+    # banco de antes do resumo: a tabela nova e preenchida com a base uma unica vez
+    with sqlite3.connect(banco) as conn:
+        conn.execute('CREATE TABLE selic (mes TEXT PRIMARY KEY, selic_diaria REAL)')
+        conn.execute("INSERT INTO selic VALUES ('2020-01', 0.05)")
+    main2.init_db()
+    main2.init_db()
+    assert linhas(banco, 'SELECT * FROM selic_mensal') == [('2020-01', 0.05, 0.05, 0.05, 1, 0.05)]
+
+
+def test_editar_lote(banco, tmp_path):
+    main2.init_db()
+    main2.ingerir(escrever(tmp_path, 'inad.csv', INADIMPLENCIA), escrever(tmp_path, 'selic.csv', SELIC))
+    versao = linhas(banco, 'SELECT geracao FROM versao_dados')
+
+    resposta = main2.app.test_client().post('/editar_lote', json={'correcoes': [
+        {'tabela': 'inadimplencia', 'mes': '2011-03', 'valor': 9.0},
+        {'tabela': 'inadimplencia', 'mes': '2011-04', 'valor': 3.24},
+        {'tabela': 'inadimplencia', 'mes': '1999-01', 'valor': 1.0},
+        {'tabela': 'selic', 'mes': '2023-02', 'valor': 0.5},
+        {'tabela': 'selic', 'mes': '2023-02', 'valor': 0.08},
+        {'tabela': 'outra', 'mes': '2023-02', 'valor': 1.0},
+    ]})
+    dados = resposta.get_json()
+    assert resposta.status_code == 200
+    assert dados['Alterados'] == 2
+    assert [r['resultado'] for r in dados['Resultados']] == [
+        'alterado', 'sem mudanca', 'mes inexistente', 'ignorado (repetido)', 'alterado', 'erro'
+    ]
+
+    assert linhas(banco, "SELECT inadimplencia FROM inadimplencia WHERE mes = '2011-03'") == [(9.0,)]
+    assert linhas(banco, "SELECT selic_diaria FROM selic WHERE mes = '2023-02'") == [(0.08,)]
+    # o resumo do mes corrigido passa a ter so o valor novo
+    assert linhas(banco, "SELECT media, minimo, maximo, contagem, ultimo FROM inadimplencia_mensal WHERE mes = '2011-03'") == [
+        (9.0, 9.0, 9.0, 1, 9.0)
+    ]
+    assert linhas(banco, "SELECT media, minimo, maximo, contagem, ultimo FROM selic_mensal WHERE mes = '2023-02'") == [
+        (0.08, 0.08, 0.08, 1, 0.08)
+    ]
+    # mes inexistente nao e criado e a versao sobe uma vez
+    assert linhas(banco, "SELECT COUNT(*) FROM inadimplencia WHERE mes = '1999-01'") == [(0,)]
+    assert linhas(banco, 'SELECT geracao FROM versao_dados') == [(versao[0][0] + 1,)]
+
+
+def test_editar_lote_sem_mudanca_mantem_versao(banco, tmp_path):
+    main2.init_db()
+    main2.ingerir(escrever(tmp_path, 'inad.csv', INADIMPLENCIA), escrever(tmp_path, 'selic.csv', SELIC))
+    versao = linhas(banco, 'SELECT geracao FROM versao_dados')
+
+    resposta = main2.app.test_client().post('/editar_lote', data={
+        'campo_tabela': 'inadimplencia',
+        'campo_correcoes': 'mes;valor\n2011-04;3,24\n'
+    })
+    assert resposta.get_json()['Resultados'][0]['resultado'] == 'sem mudanca'
+    assert linhas(banco, 'SELECT geracao FROM versao_dados') == versao
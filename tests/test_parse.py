@@ -0,0 +1,139 @@
+'''
+Interpretador da Quarteto (parse.py): compilacao e execucao
+'''
+
+import hashlib
+
+import pytest
+
+import parse
+from cache import CacheLRU
+from parse import DEFINIR, ENQUANTO, MOSTRAR, SE, SaidaBufferizada, compilar, interpretador
+
+
+def rodar(codigo, variaveis=None, max_iteracoes=1):
+    linhas = []
+    saida = SaidaBufferizada(linhas.append)
+    variaveis = interpretador(codigo, variaveis, max_iteracoes, saida)
+    return ''.join(linhas).splitlines(), variaveis
+
+
+def test_compila_em_instrucoes():
+    programa = compilar('''
+        definir nome como "Ana"
+        mostrar "Oi " + nome
+        se verdadeiro então mostrar "sim"
+        enquanto falso faça mostrar "nunca"
+    ''')
+    assert programa == (
+        (DEFINIR, 'nome', 'Ana'),
+        (MOSTRAR, (('Oi ', True), ('nome', False))),
+        (SE, 'verdadeiro', ((MOSTRAR, (('sim', True),)),)),
+        (ENQUANTO, 'falso', ((MOSTRAR, (('nunca', True),)),)),
+    )
+
+
+def test_executa_e_mostra():
+    linhas, variaveis = rodar('''
+        definir nome como "Ana"
+        mostrar "Oi " + nome
+        se verdadeiro então mostrar "sim"
+        se falso então mostrar "nao"
+        enquanto verdadeiro faça mostrar "volta"
+        comando estranho
+    ''', max_iteracoes=3)
+    assert linhas == ['Oi Ana', 'sim', 'volta', 'volta', 'volta', 'Comando não foi reconhecidocomando estranho']
+    assert variaveis == {'nome': 'Ana'}
+
+
+def test_se_aninhado():
+    linhas, _ = rodar('''
+        definir a como verdadeiro
+        definir b como falso
+        se a então se verdadeiro então mostrar "dentro"
+        se a então se b então mostrar "fora"
+        se b então se a então mostrar "fora"
+    ''')
+    assert linhas == ['dentro']
+
+
+class Contador(dict):
+    # conta as atribuicoes feitas pelo 'definir'
+    def __init__(self, *args):
+        super().__init__(*args)
+        self.atribuicoes = 0
+
+    def __setitem__(self, nome, valor):
+        self.atribuicoes += 1
+        super().__setitem__(nome, valor)
+
+
+def test_enquanto_para_quando_o_bloco_muda_a_condicao():
+    variaveis = Contador({'continuar': 'verdadeiro'})
+    rodar('enquanto continuar faça definir continuar como falso', variaveis, max_iteracoes=1000)
+    assert variaveis['continuar'] == 'falso'
+    assert variaveis.atribuicoes == 1
+
+
+def test_enquanto_respeita_max_iteracoes():
+    linhas, _ = rodar('enquanto verdadeiro faça mostrar "x"', max_iteracoes=5)
+    assert linhas == ['x'] * 5
+
+
+@pytest.fixture
+def cache_em_disco(tmp_path, monkeypatch):
+    # pasta QUARTETO_CACHE temporaria e cache em memoria vazio
+    monkeypatch.setattr(parse, 'PASTA_CACHE', str(tmp_path))
+    monkeypatch.setattr(parse, 'programas', CacheLRU(128))
+    return tmp_path
+
+
+def test_cache_em_disco_ida_e_volta(cache_em_disco, monkeypatch):
+    codigo = 'definir a como "1"\nmostrar a'
+    programa = parse.carregar(codigo)
+    chave = hashlib.sha256(codigo.encode('utf-8')).hexdigest()
+    assert (cache_em_disco / f'{chave}.qtc').exists()
+
+    # outro processo: memoria vazia, o programa vem do disco sem recompilar
+    monkeypatch.setattr(parse, 'programas', CacheLRU(128))
+    def nao_compilar(codigo):
+        raise AssertionError('compilou de novo')
+    monkeypatch.setattr(parse, 'compilar', nao_compilar)
+    assert parse.carregar(codigo) == programa
+
+
+def test_assinatura_diferente_e_tratada_como_ausente(cache_em_disco, monkeypatch):
+    codigo = 'mostrar "oi"'
+    parse.carregar(codigo)
+    # arquivo gravado por outra versao do python/marshal
+    monkeypatch.setattr(parse, 'programas', CacheLRU(128))
+    monkeypatch.setattr(parse, 'ASSINATURA', b'QTC1-0.0-m0')
+    chave = hashlib.sha256(codigo.encode('utf-8')).hexdigest()
+    assert parse.ler_do_disco(chave) is None
+    assert parse.carregar(codigo) == compilar(codigo)
+    # e regravado com a assinatura atual
+    assert (cache_em_disco / f'{chave}.qtc').read_bytes().startswith(b'QTC1-0.0-m0')
+
+
+def test_saida_escreve_em_lotes():
+    escritas = []
+    saida = SaidaBufferizada(escritas.append, tamanho_lote=3)
+    for i in range(7):
+        saida.escrever(str(i))
+    assert escritas == ['0\n1\n2\n', '3\n4\n5\n']
+    saida.descarregar()
+    saida.descarregar()
+    assert escritas == ['0\n1\n2\n', '3\n4\n5\n', '6\n']
+
+
+class Quebra:
+    def __str__(self):
+        raise RuntimeError('falhou no meio')
+
+
+def test_saida_descarrega_mesmo_com_erro():
+    escritas = []
+    saida = SaidaBufferizada(escritas.append)
+    with pytest.raises(RuntimeError):
+        interpretador('mostrar "antes"\nmostrar x\nmostrar "depois"', {'x': Quebra()}, saida=saida)
+    assert escritas == ['antes\n']
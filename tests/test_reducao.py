@@ -0,0 +1,57 @@
+'''
+Confere reducao.lttb contra uma implementacao direta do LTTB, ponto a ponto
+'''
+
+import numpy as np
+import pytest
+
+from reducao import lttb
+
+
+def lttb_referencia(y, alvo):
+    # versao direta do algoritmo (laco em python sobre cada ponto)
+    n = len(y)
+    x = np.arange(n, dtype=float)
+    limites = np.linspace(1, n - 1, alvo - 1).astype(int)
+    escolhidos = [0]
+    a = 0
+    for i in range(alvo - 2):
+        inicio, fim = limites[i], limites[i + 1]
+        if i == alvo - 3:
+            c_x, c_y = x[-1], y[-1]
+        else:
+            c_x = x[limites[i + 1]:limites[i + 2]].mean()
+            c_y = y[limites[i + 1]:limites[i + 2]].mean()
+        melhor, area_melhor = inicio, -1.0
+        for j in range(inicio, fim):
+            area = abs((x[a] - c_x) * (y[j] - y[a]) - (x[a] - x[j]) * (c_y - y[a]))
+            if area > area_melhor:
+                melhor, area_melhor = j, area
+        a = melhor
+        escolhidos.append(a)
+    escolhidos.append(n - 1)
+    return np.array(escolhidos)
+
+
+@pytest.mark.parametrize('n, alvo', [(1000, 10), (5003, 100), (2000, 1999), (300, 3)])
+def test_igual_a_referencia(n, alvo):
+    y = np.cumsum(np.random.default_rng(n).normal(size=n))
+    indices = lttb(y, alvo)
+    assert len(indices) == alvo
+    assert indices[0] == 0 and indices[-1] == n - 1
+    assert np.all(np.diff(indices) > 0)
+    np.testing.assert_array_equal(indices, lttb_referencia(y, alvo))
+
+
+def test_serie_menor_que_o_alvo_fica_inteira():
+    np.testing.assert_array_equal(lttb(np.arange(10.0), 50), np.arange(10))
+    np.testing.assert_array_equal(lttb(np.arange(10.0), None), np.arange(10))
+    assert len(lttb([], 5)) == 0
+
+
+def test_valores_nan_nao_quebram_a_escolha():
+    y = np.cumsum(np.random.default_rng(1).normal(size=1000))
+    y[100:200] = np.nan
+    indices = lttb(y, 50)
+    assert len(indices) == 50 and np.all(np.diff(indices) > 0)
+    assert len(lttb(np.full(100, np.nan), 10)) == 10